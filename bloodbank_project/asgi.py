@@ -3,4 +3,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodbank_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup; the live event stream is served here, in front of the middleware stack.
+from core.events import with_event_stream  # noqa: E402
+
+application = with_event_stream(django_application)
@@ -1,33 +1,197 @@
+import json
+
 from django.contrib import admin
-from .models import Donor, BloodInventory, BloodRequest, Donation, NotificationLog
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count
+from django.utils.functional import cached_property
+
+from .db import read_replica
+from .models import Donor, BloodInventory, BloodRequest, BloodUnit, Donation, NotificationLog, OutboxMessage
+from .search import filter_donors
+
+# Changelists count exactly up to this many rows and estimate past it.
+EXACT_COUNT_LIMIT = 10000
+VALUES_TIMEOUT = 600
+
+
+def estimated_count(queryset):
+    """A cheap estimate of queryset.count(), or None when the backend can't give one.
+
+    PostgreSQL reports the planner's row estimate. Elsewhere only an
+    unfiltered table is estimated, from the span of its primary keys.
+    """
+    connection = connections[queryset.db]
+    queryset = queryset.order_by()
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if queryset.query.where or queryset.query.distinct:
+        return None
+    # Separate subqueries, as SQLite only reads a lone MIN() or MAX() off the index.
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    pk = connection.ops.quote_name(queryset.model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT (SELECT MIN({pk}) FROM {table}), (SELECT MAX({pk}) FROM {table})")
+        first, last = cursor.fetchone()
+    return 0 if first is None else last - first + 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts small results exactly and estimates large ones.
+
+    Without an estimate, counting stops at EXACT_COUNT_LIMIT, so a broad
+    filter pages through its first EXACT_COUNT_LIMIT rows only.
+    """
+
+    @cached_property
+    def count(self):
+        count = self.object_list.order_by()[:EXACT_COUNT_LIMIT].count()
+        if count < EXACT_COUNT_LIMIT:
+            return count
+        return max(estimated_count(self.object_list) or 0, count)
+
+
+class ColumnsChangeList(ChangeList):
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.model_admin.list_only:
+            queryset = queryset.only(*self.model_admin.list_only)
+        return queryset
+
+
+class ReplicaChangeListMixin:
+    """Serve the changelist page from a read replica; actions and edits stay on the primary."""
+
+    def changelist_view(self, request, extra_context=None):
+        return read_replica(super().changelist_view)(request, extra_context)
+
+
+class LargeTableAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    """Changelist for tables too big to count or read whole rows of on every page.
+
+    list_only names the columns the changelist loads; keep it in step with
+    list_display and __str__.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_only = None
+
+    def get_changelist(self, request, **kwargs):
+        return ColumnsChangeList
+
+
+class CommonValuesFilter(admin.SimpleListFilter):
+    """Filter on the `limit` most common values of a column, recounted every VALUES_TIMEOUT seconds.
+
+    Stands in for a plain list_filter on a column without choices, whose
+    SELECT DISTINCT reads the whole table on every page load.
+    """
+    limit = None
+
+    def lookups(self, request, model_admin):
+        model = model_admin.model
+        key = f"core:admin:values:{model._meta.label_lower}:{self.parameter_name}"
+        values = cache.get(key)
+        if values is None:
+            rows = (
+                model._default_manager.exclude(**{self.parameter_name: ''}).values(self.parameter_name)
+                .annotate(rows=Count('pk')).order_by('-rows', self.parameter_name)
+                .values_list(self.parameter_name, flat=True)
+            )
+            values = list(rows[:self.limit] if self.limit else rows)
+            cache.set(key, values, VALUES_TIMEOUT)
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class TopCityFilter(CommonValuesFilter):
+    title = 'city'
+    parameter_name = 'city'
+    limit = 20
+
+
+class ChannelFilter(CommonValuesFilter):
+    title = 'channel'
+    parameter_name = 'channel'
+
+
+class StatusFilter(CommonValuesFilter):
+    title = 'status'
+    parameter_name = 'status'
 
 
 @admin.register(Donor)
-class DonorAdmin(admin.ModelAdmin):
+class DonorAdmin(LargeTableAdmin):
     list_display = ('name', 'blood_group', 'city', 'is_available', 'total_donations', 'reputation_points')
-    search_fields = ('name', 'phone', 'city', 'blood_group')
-    list_filter = ('blood_group', 'city', 'is_available')
+    list_only = list_display
+    search_fields = ('name', 'phone')
+    search_help_text = "Start of any word of the donor's name, or of their phone number."
+    list_filter = ('blood_group', TopCityFilter, 'is_available')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return filter_donors(queryset, search_term), False
 
 
 @admin.register(BloodInventory)
 class BloodInventoryAdmin(admin.ModelAdmin):
     list_display = ('blood_group', 'units_available')
+    # Counted from the BloodUnit rows; change the units, or run expire_blood_units --recount.
+    readonly_fields = ('units_available',)
+
+
+@admin.register(BloodUnit)
+class BloodUnitAdmin(LargeTableAdmin):
+    list_display = ('id', 'blood_group', 'component', 'status', 'collected_on', 'expires_on', 'issued_to')
+    list_filter = ('status', 'blood_group', 'component')
+    list_select_related = ('issued_to',)
+    list_only = (
+        'blood_group', 'component', 'status', 'collected_on', 'expires_on',
+        'issued_to__blood_group', 'issued_to__status',
+    )
+    raw_id_fields = ('donation', 'issued_to')
+    ordering = ('expires_on', 'id')
 
 
 @admin.register(BloodRequest)
-class BloodRequestAdmin(admin.ModelAdmin):
+class BloodRequestAdmin(LargeTableAdmin):
     list_display = ('id', 'patient_name', 'blood_group', 'units_requested', 'urgency', 'status', 'created_at')
+    list_only = list_display[1:]
     list_filter = ('blood_group', 'urgency', 'status')
     search_fields = ('patient_name', 'hospital_name', 'requester_name')
 
 
 @admin.register(Donation)
-class DonationAdmin(admin.ModelAdmin):
+class DonationAdmin(LargeTableAdmin):
     list_display = ('donor', 'blood_group', 'units', 'donation_date', 'is_urgent')
     list_filter = ('blood_group', 'is_urgent')
+    list_select_related = ('donor',)
+    list_only = ('blood_group', 'units', 'donation_date', 'is_urgent', 'donor__name', 'donor__blood_group')
 
 
 @admin.register(NotificationLog)
-class NotificationLogAdmin(admin.ModelAdmin):
+class NotificationLogAdmin(LargeTableAdmin):
     list_display = ('recipient', 'channel', 'subject', 'created_at', 'status')
+    # Everything but the message body.
+    list_only = list_display
+    list_filter = (ChannelFilter, StatusFilter)
+    ordering = ('-created_at', '-id')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'channel', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at')
     list_filter = ('channel', 'status')
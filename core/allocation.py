@@ -0,0 +1,197 @@
+"""Batch allocation of blood stock across every open request.
+
+Requests are served in priority order: urgency, raised one level once a
+request has waited AGING_HOURS (but never to CRITICAL), then oldest first. Each request is routed
+through a flow network from donor groups to patient groups. An augmenting
+path may move units already promised to an earlier request onto another
+compatible group, so a later request never takes stock away from an earlier
+one but can still use whatever rerouting frees up. When several donor groups
+could supply a unit, the one able to serve the fewest patient groups is used,
+which keeps versatile stock such as O- for the patients who need it.
+"""
+from collections import defaultdict, deque, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import BloodRequest, BloodUnit, BLOOD_GROUP_CHOICES
+from .utils import allocate_units, compatible_donor_groups
+
+OPEN_STATUSES = ('PENDING', 'PARTIAL')
+URGENCY_RANK = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
+AGING_HOURS = 24
+# Waiting promotes a request by at most this many levels, and only CRITICAL
+# requests are ever ranked first.
+MAX_AGING_LEVELS = 1
+
+BLOOD_GROUPS = [blood_group for blood_group, _ in BLOOD_GROUP_CHOICES]
+# How many patient groups each donor group can serve; lower is used first.
+DONOR_COST = {
+    donor: sum(donor in compatible_donor_groups(patient) for patient in BLOOD_GROUPS)
+    for donor in BLOOD_GROUPS
+}
+
+OpenRequest = namedtuple('OpenRequest', 'pk blood_group needed urgency created_at')
+
+
+def priority(request, now):
+    waited = min(int((now - request.created_at) / timedelta(hours=AGING_HOURS)), MAX_AGING_LEVELS)
+    rank = URGENCY_RANK.get(request.urgency, len(URGENCY_RANK))
+    level = max(rank - waited, min(rank, 1))
+    return level, request.created_at, request.pk
+
+
+def open_requests(now=None):
+    """Every PENDING/PARTIAL request with the units it still needs, highest priority first."""
+    now = now or timezone.now()
+    rows = BloodRequest.objects.filter(status__in=OPEN_STATUSES).annotate(
+        issued=Count('blood_units', filter=Q(blood_units__status='ISSUED')),
+    ).values_list('pk', 'blood_group', 'units_requested', 'urgency', 'created_at', 'issued')
+    requests = [
+        OpenRequest(pk, blood_group, requested - issued, urgency, created_at)
+        for pk, blood_group, requested, urgency, created_at, issued in rows
+        if requested > issued
+    ]
+    requests.sort(key=lambda request: priority(request, now))
+    return requests
+
+
+def available_stock(today=None):
+    """{blood_group: unexpired AVAILABLE units}, counted from the unit table."""
+    today = today or timezone.localdate()
+    return dict(
+        BloodUnit.objects.filter(status='AVAILABLE', expires_on__gte=today)
+        .values('blood_group').annotate(n=Count('pk')).values_list('blood_group', 'n')
+    )
+
+
+class AllocationNetwork:
+    """Donor group -> patient group flows, grown one request at a time."""
+
+    def __init__(self, stock):
+        self.spare = {group: stock.get(group, 0) for group in BLOOD_GROUPS}
+        self.flow = {group: defaultdict(int) for group in BLOOD_GROUPS}
+
+    def _find_supplier(self, patient_group):
+        # Breadth-first search backwards from the patient: a donor group can
+        # supply directly, or free a unit by handing one of its current
+        # patients to another compatible group.
+        via = {donor: None for donor in compatible_donor_groups(patient_group)}
+        queue = deque(via)
+        while queue:
+            donor = queue.popleft()
+            for patient, units in self.flow[donor].items():
+                if units:
+                    for other in compatible_donor_groups(patient):
+                        if other not in via:
+                            via[other] = (patient, donor)
+                            queue.append(other)
+        # Dicts keep insertion order, so ties go to the shortest path.
+        suppliers = [donor for donor in via if self.spare.get(donor, 0) > 0]
+        if not suppliers:
+            return None, via
+        return min(suppliers, key=DONOR_COST.get), via
+
+    def route(self, patient_group, units):
+        """Reserve up to `units` for one patient group; returns how many were reserved."""
+        reserved = 0
+        while reserved < units:
+            supplier, via = self._find_supplier(patient_group)
+            if supplier is None:
+                break
+            amount = min(units - reserved, self.spare[supplier])
+            donor = supplier
+            while via[donor] is not None:
+                patient, donor = via[donor]
+                amount = min(amount, self.flow[donor][patient])
+            self.spare[supplier] -= amount
+            donor = supplier
+            while via[donor] is not None:
+                patient, freed = via[donor]
+                self.flow[donor][patient] += amount
+                self.flow[freed][patient] -= amount
+                donor = freed
+            self.flow[donor][patient_group] += amount
+            reserved += amount
+        return reserved
+
+
+def plan_allocation(requests, stock):
+    """Split `stock` over `requests` (in priority order, as from open_requests).
+
+    Returns ([(request, {donor_group: units}), ...], leftover stock).
+    """
+    network = AllocationNetwork(stock)
+    reserved = [network.route(request.blood_group, request.needed) for request in requests]
+
+    # Flows are per patient group; hand each group's units to its requests in
+    # priority order, least versatile donor group first.
+    by_patient = defaultdict(list)
+    for donor, patients in network.flow.items():
+        for patient, units in patients.items():
+            if units:
+                by_patient[patient].append([donor, units])
+    for supplies in by_patient.values():
+        supplies.sort(key=lambda supply: DONOR_COST[supply[0]])
+
+    plan = []
+    for request, units in zip(requests, reserved):
+        groups = {}
+        supplies = by_patient[request.blood_group]
+        while units:
+            supply = supplies[0]
+            taken = min(units, supply[1])
+            groups[supply[0]] = groups.get(supply[0], 0) + taken
+            supply[1] -= taken
+            units -= taken
+            if not supply[1]:
+                supplies.pop(0)
+        plan.append((request, groups))
+    return plan, {group: units for group, units in network.spare.items() if units}
+
+
+def _issue(blood_request, request, groups):
+    with transaction.atomic():
+        issued = 0
+        for donor_group, units in groups.items():
+            ids = allocate_units(request.blood_group, units, blood_request, donor_groups=(donor_group,))
+            if not ids:
+                transaction.set_rollback(True)
+                return None
+            issued += len(ids)
+        blood_request.status = 'FULFILLED' if issued >= request.needed else 'PARTIAL'
+        blood_request.save()
+    return blood_request.status
+
+
+def apply_plan(plan):
+    """Issue the planned units, one transaction per request.
+
+    A request that was closed, or whose units were taken since planning, is
+    skipped whole; run the scheduler again to pick it up.
+    """
+    planned = [(request, groups) for request, groups in plan if groups]
+    instances = BloodRequest.objects.in_bulk([request.pk for request, _ in planned])
+    result = {'FULFILLED': [], 'PARTIAL': [], None: []}
+    for request, groups in planned:
+        blood_request = instances.get(request.pk)
+        status = None
+        if blood_request is not None and blood_request.status in OPEN_STATUSES:
+            status = _issue(blood_request, request, groups)
+        result[status].append(request.pk)
+    return {'fulfilled': result['FULFILLED'], 'partial': result['PARTIAL'], 'skipped': result[None]}
+
+
+def summarize(plan):
+    """Per-urgency totals for a plan: requests, units needed and allocated, requests fully covered."""
+    summary = {urgency: dict.fromkeys(('requests', 'needed', 'allocated', 'covered'), 0) for urgency in URGENCY_RANK}
+    for request, groups in plan:
+        row = summary[request.urgency]
+        allocated = sum(groups.values())
+        row['requests'] += 1
+        row['needed'] += request.needed
+        row['allocated'] += allocated
+        row['covered'] += allocated >= request.needed
+    return summary
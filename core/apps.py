@@ -3,3 +3,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import db, signals  # noqa: F401
+        from .metrics import instrument_templates
+        instrument_templates()
@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend whose transactions take the write lock up front.
+
+    A deferred BEGIN starts as a reader; if another connection commits
+    before this one first writes, the upgrade fails at once with "database is
+    locked", without waiting on busy_timeout. BEGIN IMMEDIATE waits for the
+    lock at the start instead (Django 5.1 adds this as OPTIONS transaction_mode).
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .db import current_replica
+from .models import Donor, BloodRequest, DailyDonationStat
+from .utils import get_or_create_inventory
+
+SNAPSHOT_KEY = 'core:dashboard:snapshot'
+# Signals keep the snapshot fresh; the timeout only bounds staleness from
+# writes that bypass them (raw SQL, another process on a per-process cache).
+SNAPSHOT_TIMEOUT = 300
+# Snapshots read from a replica are cached apart, briefly: invalidation only
+# clears the primary's, and a lagging replica may still miss the change.
+REPLICA_SNAPSHOT_TIMEOUT = 10
+
+
+def compute_snapshot():
+    requests = BloodRequest.objects.aggregate(
+        pending_requests=Count('pk', filter=Q(status='PENDING')),
+        fulfilled_requests=Count('pk', filter=Q(status='FULFILLED')),
+    )
+    inventory = [
+        {'blood_group': bg, 'units_available': units}
+        for bg, units in get_or_create_inventory().values_list('blood_group', 'units_available')
+    ]
+    # Read from the daily rollup rather than grouping every Donation row.
+    donations_stats = list(
+        DailyDonationStat.objects.values('blood_group').annotate(total_units=Sum('units')).order_by('blood_group')
+    )
+    return {
+        'donor_count': Donor.objects.count(),
+        'total_units': sum(item['units_available'] for item in inventory),
+        'pending_requests': requests['pending_requests'],
+        'fulfilled_requests': requests['fulfilled_requests'],
+        'inventory': inventory,
+        'donations_stats': donations_stats,
+    }
+
+
+def get_dashboard_snapshot():
+    replica = current_replica()
+    key = SNAPSHOT_KEY if replica is None else f"{SNAPSHOT_KEY}:{replica}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = compute_snapshot()
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT if replica is None else REPLICA_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate_dashboard_snapshot():
+    # Defer until commit so a concurrent reader can't re-cache pre-commit data.
+    transaction.on_commit(lambda: cache.delete(SNAPSHOT_KEY))
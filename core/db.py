@@ -0,0 +1,149 @@
+"""Database connection setup and read-replica routing.
+
+SQLite keeps most settings per connection, so SQLITE_PRAGMAS are applied
+each time one opens. journal_mode=WAL is the exception: it is stored in the
+database file and stays on once set.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+# Replica routing. Reads go to a replica only inside replica_reads(), which
+# read-only views enter through @read_replica; everything else, and every
+# write, uses the primary.
+_replica = ContextVar('db_replica', default=None)
+_request_state = ContextVar('db_request_state', default=None)
+
+# Session key holding the time until which this session reads from the primary.
+PIN_SESSION_KEY = '_db_pin_primary_until'
+
+
+class RequestState:
+    __slots__ = ('session', 'wrote')
+
+    def __init__(self, session):
+        self.session = session
+        self.wrote = False
+
+    @property
+    def pinned_until(self):
+        # Read lazily, so views that never route to a replica don't load the session.
+        return self.session.get(PIN_SESSION_KEY, 0)
+
+    @property
+    def pinned(self):
+        return self.pinned_until > time.time()
+
+
+def current_replica():
+    """Alias reads are currently routed to, or None for the primary."""
+    alias = _replica.get()
+    if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    return alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return current_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def replica_reads():
+    """Route reads in the block to a random replica, unless the session is pinned to the primary."""
+    state = _request_state.get()
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    alias = None
+    if replicas and not (state is not None and state.pinned):
+        alias = random.choice(replicas)
+    token = _replica.set(alias)
+    try:
+        yield alias
+    finally:
+        _replica.reset(token)
+
+
+def _streamed_on(content, alias):
+    # Chunks are produced after the view returns, so route each one again.
+    iterator = iter(content)
+    while True:
+        token = _replica.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _replica.reset(token)
+        yield chunk
+
+
+def read_replica(view):
+    """Serve GET and HEAD requests of `view` from a replica; other methods use the primary."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        with replica_reads() as alias:
+            response = view(request, *args, **kwargs)
+            # Template responses (the admin's) would otherwise query while rendering, outside the block.
+            if not response.streaming and hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        if alias and response.streaming:
+            response.streaming_content = _streamed_on(response.streaming_content, alias)
+        return response
+    return wrapped
+
+
+class ReplicaPinMiddleware:
+    """Keep a session on the primary for REPLICA_PIN_SECONDS after it writes, to cover replication lag.
+
+    Saving the session costs queries of its own, so the pin is set for twice
+    that and only renewed once less than REPLICA_PIN_SECONDS of it is left;
+    without replicas there is nothing to pin.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestState(request.session)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            now, pin = time.time(), settings.REPLICA_PIN_SECONDS
+            if state.pinned_until < now + pin:
+                request.session[PIN_SESSION_KEY] = now + 2 * pin
+        return response
@@ -0,0 +1,282 @@
+"""In-process pub/sub for live inventory and request updates, streamed as server-sent events.
+
+Signal handlers publish from whatever thread made the change; subscribers are
+asyncio queues owned by the ASGI event loop, so an idle connection costs a
+queue and a coroutine rather than a thread. The broker lives in the worker
+process: run a single ASGI worker, or put an external bus in front of it,
+for every subscriber to see every write.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+
+from .models import BloodInventory
+
+HEARTBEAT_SECONDS = 15
+# Milliseconds browsers wait before reconnecting; they resume from Last-Event-ID.
+RETRY_MS = 3000
+# A subscriber this far behind is disconnected and catches up from the history on reconnect.
+QUEUE_SIZE = 100
+HISTORY_SIZE = 500
+
+
+class Event:
+    __slots__ = ('id', 'name', 'data', 'published_at', 'payload')
+
+    def __init__(self, id, name, data):
+        self.id = id
+        self.name = name
+        self.data = data
+        self.published_at = time.perf_counter()
+        # Encoded once and shared by every subscriber.
+        self.payload = f"id: {id}\nevent: {name}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+class Subscription:
+    def __init__(self, loop, queue_size):
+        self.loop = loop
+        self.queue_size = queue_size
+        self.pending = deque()
+        self.overflowed = False
+        self.closed = False
+        self._waiter = None
+
+    def put(self, event):
+        if len(self.pending) >= self.queue_size:
+            self.overflowed = True
+        else:
+            self.pending.append(event)
+        self.wake()
+
+    def close(self):
+        self.closed = True
+        self.wake()
+
+    def wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def next_events(self, timeout):
+        """Wait up to timeout seconds; return every queued event (empty on timeout)."""
+        if not self.pending and not self.closed:
+            # A bare future rather than a task per wait keeps a wake-up cheap with many subscribers.
+            self._waiter = self.loop.create_future()
+            timer = self.loop.call_later(timeout, self.wake)
+            try:
+                await self._waiter
+            finally:
+                timer.cancel()
+                self._waiter = None
+        events = list(self.pending)
+        self.pending.clear()
+        return events
+
+
+def _fan_out(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.put(event)
+
+
+class EventBroker:
+    def __init__(self, queue_size=QUEUE_SIZE, history_size=HISTORY_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._by_loop = {}
+        self._history = deque(maxlen=history_size)
+        self._last_id = 0
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._by_loop.values())
+
+    def skip(self):
+        """Account for an unpublished event, so a resuming client is told to reload."""
+        with self._lock:
+            self._last_id += 1
+            self._history.clear()
+
+    def publish(self, name, data):
+        """Send an event to every subscriber; safe to call from any thread."""
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, name, data)
+            self._history.append(event)
+            targets = [(loop, tuple(subs)) for loop, subs in self._by_loop.items()]
+        # One wake-up per event loop rather than one per subscriber.
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(_fan_out, subscriptions, event)
+            except RuntimeError:
+                pass  # loop already closed; its subscriptions are going away
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """Register the running loop's subscriber; returns (subscription, missed events or None).
+
+        None means events after last_event_id are no longer in the history and
+        the client should reload its state.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._by_loop.setdefault(subscription.loop, set()).add(subscription)
+            missed = []
+            if last_event_id is not None:
+                oldest = self._history[0].id if self._history else self._last_id + 1
+                if last_event_id > self._last_id or last_event_id + 1 < oldest:
+                    missed = None
+                else:
+                    missed = [event for event in self._history if event.id > last_event_id]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._by_loop.get(subscription.loop)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._by_loop[subscription.loop]
+
+
+broker = EventBroker()
+
+
+def publish_inventory(blood_groups):
+    if not broker:
+        return broker.skip()
+    rows = BloodInventory.objects.filter(blood_group__in=blood_groups).order_by('blood_group')
+    broker.publish('inventory', {'inventory': list(rows.values('blood_group', 'units_available', 'version'))})
+
+
+# Dashboard cards counting requests in each status.
+STATUS_STATS = {'PENDING': 'pending_requests', 'FULFILLED': 'fulfilled_requests'}
+
+
+def status_changes(previous_status, status):
+    """How much each dashboard count moves when a request goes from previous_status to status."""
+    changes = {}
+    if previous_status != status:
+        for value, sign in ((previous_status, -1), (status, 1)):
+            if value in STATUS_STATS:
+                changes[STATUS_STATS[value]] = sign
+    return changes
+
+
+def request_event_data(blood_request, created, previous_status=None):
+    return {
+        'id': blood_request.pk,
+        'created': created,
+        'patient_name': blood_request.patient_name,
+        'blood_group': blood_request.blood_group,
+        'units_requested': blood_request.units_requested,
+        'urgency': blood_request.urgency,
+        'status': blood_request.status,
+        # Deltas rather than totals, so a save doesn't count every request;
+        # a client that misses events gets a reset and reloads.
+        'changes': status_changes(previous_status, blood_request.status),
+    }
+
+
+def publish_request(data):
+    if not broker:
+        return broker.skip()
+    broker.publish('request', data)
+
+
+def _load_user(session_key):
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(request)
+    return user if user.is_authenticated else None
+
+
+async def authenticated_user(scope):
+    headers = dict(scope.get('headers', []))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+    return await sync_to_async(_load_user)(session_key)
+
+
+def _last_event_id(scope):
+    headers = dict(scope.get('headers', []))
+    value = headers.get(b'last-event-id', b'').decode('latin-1')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def _send_status(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_for_disconnect(receive, subscription):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscription.close()
+
+
+async def event_stream(scope, receive, send):
+    """ASGI app streaming broker events to a logged-in user."""
+    if scope['method'] != 'GET':
+        return await _send_status(send, 405, b'Method not allowed')
+    if await authenticated_user(scope) is None:
+        return await _send_status(send, 403, b'Login required')
+
+    subscription, missed = broker.subscribe(_last_event_id(scope))
+    watcher = asyncio.ensure_future(_wait_for_disconnect(receive, subscription))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        opening = f"retry: {RETRY_MS}\n\n".encode()
+        if missed is None:
+            opening += b"event: reset\ndata: {}\n\n"
+        else:
+            opening += b''.join(event.payload for event in missed)
+        await send({'type': 'http.response.body', 'body': opening, 'more_body': True})
+
+        while not subscription.closed and not subscription.overflowed:
+            events = await subscription.next_events(HEARTBEAT_SECONDS)
+            if subscription.closed:
+                break
+            chunk = b''.join(event.payload for event in events) or b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        broker.unsubscribe(subscription)
+        watcher.cancel()
+    if not subscription.closed:
+        # Overflowed: end the response so the browser reconnects and replays from history.
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+def with_event_stream(application, path=None):
+    """Serve the event stream at settings.EVENT_STREAM_URL ahead of the Django application.
+
+    It bypasses the middleware stack: one sync-only middleware would otherwise
+    park a thread on every open stream.
+    """
+    path = path or settings.EVENT_STREAM_URL
+    if not path:
+        return application
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == path:
+            return await event_stream(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return router
@@ -0,0 +1,129 @@
+"""Streaming CSV and JSON-lines extracts of donations, requests and notification logs.
+
+Rows are read with values_list().iterator(chunk_size) and written one chunk
+at a time, so memory stays flat however many rows match and the header goes
+out before the first query runs. Request rows carry their assigned donor ids,
+fetched with one query per chunk.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+from .models import Donation, BloodRequest, NotificationLog
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Export:
+    def __init__(self, model, fields, date_field, blood_group_field=None, headers=None):
+        self.model = model
+        self.fields = fields
+        self.date_field = date_field
+        self.blood_group_field = blood_group_field
+        self.headers = headers or fields
+
+    def queryset(self, since=None, until=None, blood_group=None):
+        rows = self.model.objects.order_by('pk')
+        is_datetime = self.model._meta.get_field(self.date_field).get_internal_type() == 'DateTimeField'
+        if since:
+            start = _day_start(since) if is_datetime else since
+            rows = rows.filter(**{f'{self.date_field}__gte': start})
+        if until:
+            if is_datetime:
+                rows = rows.filter(**{f'{self.date_field}__lt': _day_start(until + timedelta(days=1))})
+            else:
+                rows = rows.filter(**{f'{self.date_field}__lte': until})
+        if blood_group:
+            rows = rows.filter(**{self.blood_group_field: blood_group})
+        return rows.values_list(*self.fields)
+
+    def chunks(self, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+        """Lists of row tuples, at most chunk_size long."""
+        iterator = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+class RequestExport(Export):
+    def chunks(self, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+        # A manual per-chunk prefetch: the rows are tuples, not instances.
+        Assignment = BloodRequest.donors_assigned.through
+        for chunk in super().chunks(queryset, chunk_size):
+            donors = {}
+            assignments = Assignment.objects.filter(bloodrequest_id__in=[row[0] for row in chunk])
+            for request_id, donor_id in assignments.order_by('donor_id').values_list('bloodrequest_id', 'donor_id'):
+                donors.setdefault(request_id, []).append(donor_id)
+            yield [(*row, donors.get(row[0], [])) for row in chunk]
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+EXPORTS = {
+    'donations': Export(
+        Donation,
+        ('id', 'donation_date', 'donor_id', 'donor__name', 'blood_group', 'units', 'is_urgent'),
+        'donation_date', 'blood_group',
+        headers=('id', 'donation_date', 'donor_id', 'donor_name', 'blood_group', 'units', 'is_urgent'),
+    ),
+    'requests': RequestExport(
+        BloodRequest,
+        ('id', 'created_at', 'patient_name', 'hospital_name', 'location', 'blood_group', 'units_requested',
+         'urgency', 'status', 'fulfilled_at'),
+        'created_at', 'blood_group',
+        headers=('id', 'created_at', 'patient_name', 'hospital_name', 'location', 'blood_group', 'units_requested',
+                 'urgency', 'status', 'fulfilled_at', 'donors_assigned'),
+    ),
+    'notifications': Export(
+        NotificationLog,
+        ('id', 'created_at', 'recipient', 'channel', 'subject', 'message', 'status'),
+        'created_at',
+    ),
+}
+
+
+def _csv_value(value):
+    # Assigned donors go in one cell as space-separated ids.
+    return ' '.join(map(str, value)) if isinstance(value, list) else value
+
+
+def render_csv(headers, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield buffer.getvalue()
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue()
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def render_jsonl(headers, chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(dict(zip(headers, row)), default=_json_value) + '\n' for row in chunk)
+
+
+RENDERERS = {'csv': render_csv, 'jsonl': render_jsonl}
+
+
+def gzipped(parts):
+    """gzip-compress an iterable of str, yielding bytes as each part is compressed."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for part in parts:
+        # A sync flush per part sends each chunk at once instead of waiting on zlib's buffer.
+        yield compressor.compress(part.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
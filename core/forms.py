@@ -1,5 +1,8 @@
 from django import forms
-from .models import Donor, BloodRequest, Donation, BLOOD_GROUP_CHOICES, URGENCY_CHOICES
+from .models import (
+    Donor, BloodRequest, Donation, BLOOD_GROUP_CHOICES, URGENCY_CHOICES, REQUEST_STATUS, COMPONENT_CHOICES,
+)
+from .search import MAX_LIMIT
 from datetime import date
 
 
@@ -30,6 +33,8 @@ class DonorForm(forms.ModelForm):
 
 
 class DonationForm(forms.ModelForm):
+    component = forms.ChoiceField(choices=COMPONENT_CHOICES, initial='WHOLE_BLOOD')
+
     class Meta:
         model = Donation
         fields = ['donor', 'blood_group', 'units', 'donation_date', 'is_urgent']
@@ -65,6 +70,7 @@ class PatientQRFilterForm(forms.Form):
         required=False
     )
     city = forms.CharField(required=False)
+    radius_km = forms.IntegerField(min_value=1, max_value=500, initial=25, required=False, label="Radius (km)")
     urgency = forms.ChoiceField(
         choices=[('', 'Any')] + URGENCY_CHOICES,
         required=False
@@ -73,3 +79,91 @@ class PatientQRFilterForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         apply_bootstrap_widgets(self.fields)
+
+
+LIST_SORT_CHOICES = [
+    ('newest', 'Newest first'),
+    ('oldest', 'Oldest first'),
+]
+
+
+class DonorListFilterForm(forms.Form):
+    q = forms.CharField(required=False, max_length=100, label="Name or phone")
+    blood_group = forms.ChoiceField(
+        choices=[('', 'Any')] + BLOOD_GROUP_CHOICES,
+        required=False
+    )
+    city = forms.CharField(required=False)
+    is_available = forms.ChoiceField(
+        choices=[('', 'Any'), ('yes', 'Available'), ('no', 'Unavailable')],
+        required=False
+    )
+    eligibility = forms.ChoiceField(
+        choices=[('', 'Any'), ('eligible', 'Eligible now'), ('waiting', 'Not yet eligible')],
+        required=False
+    )
+    sort = forms.ChoiceField(choices=LIST_SORT_CHOICES, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        apply_bootstrap_widgets(self.fields)
+
+
+class RequestListFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        choices=[('', 'Any')] + REQUEST_STATUS,
+        required=False
+    )
+    blood_group = forms.ChoiceField(
+        choices=[('', 'Any')] + BLOOD_GROUP_CHOICES,
+        required=False
+    )
+    urgency = forms.ChoiceField(
+        choices=[('', 'Any')] + URGENCY_CHOICES,
+        required=False
+    )
+    sort = forms.ChoiceField(choices=LIST_SORT_CHOICES, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        apply_bootstrap_widgets(self.fields)
+
+
+class ReportFilterForm(forms.Form):
+    days = forms.IntegerField(min_value=1, max_value=366, required=False, initial=30)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        apply_bootstrap_widgets(self.fields)
+
+
+class ExportFilterForm(forms.Form):
+    since = forms.DateField(required=False, help_text="First day, inclusive.")
+    until = forms.DateField(required=False, help_text="Last day, inclusive.")
+    blood_group = forms.ChoiceField(
+        choices=[('', 'Any')] + BLOOD_GROUP_CHOICES,
+        required=False
+    )
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON lines')], required=False)
+    gzip = forms.BooleanField(required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        since, until = cleaned.get('since'), cleaned.get('until')
+        if since and until and since > until:
+            raise forms.ValidationError("since is after until.")
+        return cleaned
+
+
+class DonorSearchForm(forms.Form):
+    q = forms.CharField(max_length=100, help_text="Start of any word of the name, or of the phone number.")
+    blood_group = forms.ChoiceField(
+        choices=[('', 'Any')] + BLOOD_GROUP_CHOICES,
+        required=False
+    )
+    limit = forms.IntegerField(min_value=1, max_value=MAX_LIMIT, required=False)
+
+
+class IssueUnitsForm(forms.Form):
+    # Left empty, the whole request is issued.
+    units_to_issue = forms.IntegerField(min_value=1, required=False)
@@ -0,0 +1,164 @@
+import math
+import re
+
+EARTH_RADIUS_KM = 6371.0088
+# Grid cells are GRID_DEGREES on a side (about 11 km north-south), small
+# enough that a city-radius search touches a few dozen indexed cells.
+GRID_DEGREES = 0.1
+# Beyond this many cells an IN list stops paying off; fall back to a latitude band.
+MAX_CELLS = 400
+
+# Offline gazetteer used to place donors and requests that only have a city name.
+GAZETTEER = {
+    'agra': (27.1767, 78.0081),
+    'ahmedabad': (23.0225, 72.5714),
+    'ajmer': (26.4499, 74.6399),
+    'allahabad': (25.4358, 81.8463),
+    'amritsar': (31.6340, 74.8723),
+    'aurangabad': (19.8762, 75.3433),
+    'bangalore': (12.9716, 77.5946),
+    'bengaluru': (12.9716, 77.5946),
+    'bhopal': (23.2599, 77.4126),
+    'bhubaneswar': (20.2961, 85.8245),
+    'chandigarh': (30.7333, 76.7794),
+    'chennai': (13.0827, 80.2707),
+    'coimbatore': (11.0168, 76.9558),
+    'dehradun': (30.3165, 78.0322),
+    'delhi': (28.7041, 77.1025),
+    'faridabad': (28.4089, 77.3178),
+    'ghaziabad': (28.6692, 77.4538),
+    'gurgaon': (28.4595, 77.0266),
+    'gurugram': (28.4595, 77.0266),
+    'guwahati': (26.1445, 91.7362),
+    'hyderabad': (17.3850, 78.4867),
+    'indore': (22.7196, 75.8577),
+    'jaipur': (26.9124, 75.7873),
+    'jodhpur': (26.2389, 73.0243),
+    'kanpur': (26.4499, 80.3319),
+    'kochi': (9.9312, 76.2673),
+    'kolkata': (22.5726, 88.3639),
+    'kota': (25.2138, 75.8648),
+    'lucknow': (26.8467, 80.9462),
+    'ludhiana': (30.9010, 75.8573),
+    'madurai': (9.9252, 78.1198),
+    'mangalore': (12.9141, 74.8560),
+    'meerut': (28.9845, 77.7064),
+    'mumbai': (19.0760, 72.8777),
+    'mysore': (12.2958, 76.6394),
+    'nagpur': (21.1458, 79.0882),
+    'nashik': (19.9975, 73.7898),
+    'navi mumbai': (19.0330, 73.0297),
+    'new delhi': (28.6139, 77.2090),
+    'noida': (28.5355, 77.3910),
+    'patna': (25.5941, 85.1376),
+    'pune': (18.5204, 73.8567),
+    'raipur': (21.2514, 81.6296),
+    'rajkot': (22.3039, 70.8022),
+    'ranchi': (23.3441, 85.3096),
+    'surat': (21.1702, 72.8311),
+    'thane': (19.2183, 72.9781),
+    'thiruvananthapuram': (8.5241, 76.9366),
+    'vadodara': (22.3072, 73.1812),
+    'varanasi': (25.3176, 82.9739),
+    'vijayawada': (16.5062, 80.6480),
+    'visakhapatnam': (17.6868, 83.2185),
+}
+
+
+def normalize_place(name):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', name or '').lower().split())
+
+
+def lookup_place(text):
+    """Coordinates for a city name or free-text location ("City Hospital, Pune")."""
+    place = normalize_place(text)
+    if not place:
+        return None
+    if place in GAZETTEER:
+        return GAZETTEER[place]
+    parts = [normalize_place(p) for p in (text or '').split(',')]
+    words = place.split()
+    # Try comma-separated parts, then two-word and single-word names.
+    candidates = parts + [' '.join(words[i:i + 2]) for i in range(len(words) - 1)] + words
+    for candidate in candidates:
+        if candidate in GAZETTEER:
+            return GAZETTEER[candidate]
+    return None
+
+
+def grid_cell(latitude, longitude):
+    if latitude is None or longitude is None:
+        return ''
+    return f"{math.floor(latitude / GRID_DEGREES)}:{math.floor(longitude / GRID_DEGREES)}"
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    # Longitude degrees shrink towards the poles; clamp to avoid dividing by ~0.
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(latitude)), 0.01)))
+    return latitude - dlat, latitude + dlat, longitude - dlng, longitude + dlng
+
+
+def cells_covering(latitude, longitude, radius_km):
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    rows = range(math.floor(min_lat / GRID_DEGREES), math.floor(max_lat / GRID_DEGREES) + 1)
+    cols = range(math.floor(min_lng / GRID_DEGREES), math.floor(max_lng / GRID_DEGREES) + 1)
+    if len(rows) * len(cols) > MAX_CELLS:
+        return None
+    return [f"{r}:{c}" for r in rows for c in cols]
+
+
+def within_radius(queryset, latitude, longitude, radius_km, limit=None):
+    """Return [(pk, distance_km)] nearest first for rows of queryset within radius_km.
+
+    The grid-cell index (or a latitude/longitude band for very large radii)
+    narrows the candidates; exact haversine distance settles the rest.
+    """
+    cells = cells_covering(latitude, longitude, radius_km)
+    if cells is not None:
+        queryset = queryset.filter(grid_cell__in=cells)
+    else:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+        queryset = queryset.filter(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+
+    hits = []
+    for pk, lat, lng in queryset.values_list('pk', 'latitude', 'longitude').iterator(chunk_size=2000):
+        distance = haversine_km(latitude, longitude, lat, lng)
+        if distance <= radius_km:
+            hits.append((pk, distance))
+    hits.sort(key=lambda hit: hit[1])
+    return hits[:limit] if limit else hits
+
+
+def nearest(queryset, latitude, longitude, radius_km, limit=None):
+    """Like within_radius() but returns model instances with a `distance_km` attribute."""
+    hits = within_radius(queryset, latitude, longitude, radius_km, limit)
+    objects = queryset.in_bulk([pk for pk, _ in hits])
+    result = []
+    for pk, distance in hits:
+        obj = objects[pk]
+        obj.distance_km = distance
+        result.append(obj)
+    return result
+
+
+def assign_location(obj, place):
+    """Fill missing coordinates from the gazetteer and refresh the grid cell.
+
+    Coordinates are looked up again when `place` differs from the one `obj`
+    was loaded with (see core.models.LocatedModel), however it was changed.
+    """
+    if place != getattr(obj, '_loaded_place', place):
+        obj.latitude = obj.longitude = None
+    obj._loaded_place = place
+    if obj.latitude is None or obj.longitude is None:
+        coords = lookup_place(place)
+        obj.latitude, obj.longitude = coords if coords else (None, None)
+    if hasattr(obj, 'grid_cell'):
+        obj.grid_cell = grid_cell(obj.latitude, obj.longitude)
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.allocation import apply_plan, available_stock, open_requests, plan_allocation, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Plan how current stock is split over every pending and partial blood request, "
+        "by urgency and waiting time, and with --apply issue the units."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help="Issue the planned units; without it this is a dry run.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        requests = open_requests()
+        stock = available_stock()
+        loaded = time.perf_counter()
+        plan, leftover = plan_allocation(requests, stock)
+        solved = time.perf_counter()
+
+        self.stdout.write(
+            f"{len(requests)} open requests, {sum(stock.values())} units in stock; "
+            f"loaded in {(loaded - started) * 1000:.1f} ms, planned in {(solved - loaded) * 1000:.1f} ms."
+        )
+        for urgency, row in summarize(plan).items():
+            self.stdout.write(
+                f"{urgency:<9} {row['requests']:>6} requests  {row['allocated']:>6}/{row['needed']:<6} units  "
+                f"{row['covered']:>6} fully covered"
+            )
+        self.stdout.write("Left over: " + (', '.join(f"{group} {units}" for group, units in sorted(leftover.items())) or "none"))
+        if options['verbosity'] > 1:
+            for request, groups in plan:
+                if groups:
+                    sources = ', '.join(f"{units} {group}" for group, units in groups.items())
+                    self.stdout.write(f"#{request.pk} {request.urgency} {request.blood_group}: {sources}")
+
+        if options['apply']:
+            result = apply_plan(plan)
+            self.stdout.write(
+                f"Issued in {time.perf_counter() - solved:.2f}s: {len(result['fulfilled'])} fulfilled, "
+                f"{len(result['partial'])} partial, {len(result['skipped'])} skipped."
+            )
@@ -0,0 +1,65 @@
+import gzip
+import json
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import NotificationLog
+
+FIELDS = ('id', 'recipient', 'channel', 'subject', 'message', 'created_at', 'status')
+
+
+class Command(BaseCommand):
+    help = (
+        "Move NotificationLog rows older than the retention period into monthly "
+        "gzip JSON-lines archives, one bounded chunk at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.NOTIFICATION_LOG_RETENTION_DAYS,
+                            help="Keep rows newer than this many days.")
+        parser.add_argument('--archive-dir', default=settings.NOTIFICATION_ARCHIVE_DIR)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old_rows = NotificationLog.objects.filter(created_at__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f"{old_rows.count()} rows older than {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        archive_dir = Path(options['archive_dir'])
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        archived = 0
+        last_id = 0
+        while True:
+            chunk = list(
+                old_rows.filter(id__gt=last_id).order_by('id').values(*FIELDS)[:options['chunk_size']]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1]['id']
+
+            by_month = {}
+            for row in chunk:
+                by_month.setdefault(row['created_at'].strftime('%Y-%m'), []).append(row)
+            # gzip members can be concatenated, so each chunk appends a new member.
+            for month, rows in by_month.items():
+                path = archive_dir / f"notification_logs-{month}.jsonl.gz"
+                with gzip.open(path, 'at', encoding='utf-8') as archive:
+                    for row in rows:
+                        archive.write(json.dumps(row, default=str) + '\n')
+
+            # Rows are only deleted once they are safely on disk.
+            with transaction.atomic():
+                NotificationLog.objects.filter(id__in=[row['id'] for row in chunk]).delete()
+            archived += len(chunk)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Archived {archived} rows...")
+
+        self.stdout.write(f"Archived {archived} rows older than {cutoff:%Y-%m-%d} to {archive_dir}.")
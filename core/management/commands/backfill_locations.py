@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.geo import assign_location
+from core.models import Donor, BloodRequest
+from core.ranking import bump_donor_pool
+from core.utils import bulk_update_rows
+
+
+class Command(BaseCommand):
+    help = "Fill missing donor and request coordinates from the offline city gazetteer, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        jobs = (
+            (Donor, 'city', ['latitude', 'longitude', 'grid_cell']),
+            (BloodRequest, 'location', ['latitude', 'longitude']),
+        )
+        for model, place_field, fields in jobs:
+            located = scanned = 0
+            last_id = 0
+            while True:
+                chunk = list(
+                    model.objects.filter(latitude__isnull=True, id__gt=last_id)
+                    .only('id', place_field, *fields).order_by('id')[:options['chunk_size']]
+                )
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+                scanned += len(chunk)
+                for obj in chunk:
+                    assign_location(obj, getattr(obj, place_field))
+                found = [obj for obj in chunk if obj.latitude is not None]
+                with transaction.atomic():
+                    bulk_update_rows(model, found, fields)
+                located += len(found)
+            if model is Donor and located:
+                # Coordinates feed the ranking, and bulk updates skip the signals.
+                bump_donor_pool()
+            self.stdout.write(f"{model.__name__}: located {located} of {scanned} rows without coordinates.")
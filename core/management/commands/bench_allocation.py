@@ -0,0 +1,95 @@
+import random
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.allocation import available_stock, open_requests, plan_allocation, summarize
+from core.models import BloodUnit, BLOOD_GROUP_CHOICES, SHELF_LIFE
+from core.utils import compatible_donor_groups
+
+
+def greedy_allocate(requests, expiries):
+    # The per-request approach of assign_donors_to_request: each request in
+    # turn takes the first-expiring compatible units, all or nothing.
+    expiries = {group: deque(dates) for group, dates in expiries.items()}
+    plan = []
+    for request in requests:
+        groups = [group for group in compatible_donor_groups(request.blood_group) if expiries.get(group)]
+        taken = {}
+        if sum(len(expiries[group]) for group in groups) >= request.needed:
+            for _ in range(request.needed):
+                group = min((group for group in groups if expiries[group]), key=lambda g: expiries[g][0])
+                expiries[group].popleft()
+                taken[group] = taken.get(group, 0) + 1
+        plan.append((request, taken))
+    return plan
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the batch allocation scheduler with greedy per-request allocation on the "
+        "current open requests and stock. Nothing is written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--stock-ratio', type=float,
+                            help="Pretend each group holds this fraction of its own open demand, with random expiry dates.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        requests = open_requests()
+        if not requests:
+            raise CommandError("No open blood requests; run seed_bench first.")
+        if options['stock_ratio']:
+            demand = defaultdict(int)
+            for request in requests:
+                demand[request.blood_group] += request.needed
+            expiries = self.synthetic_stock(demand, options['stock_ratio'], random.Random(options['seed']))
+            stock = {group: len(dates) for group, dates in expiries.items()}
+        else:
+            stock = available_stock()
+            expiries = defaultdict(list)
+            units = BloodUnit.objects.filter(status='AVAILABLE', expires_on__gte=timezone.localdate())
+            for group, expires_on in units.order_by('expires_on', 'id').values_list('blood_group', 'expires_on'):
+                expiries[group].append(expires_on)
+        arrival = sorted(requests, key=lambda request: (request.created_at, request.pk))
+
+        self.stdout.write(f"{len(requests)} open requests needing {sum(r.needed for r in requests)} units, "
+                          f"{sum(stock.values())} units in stock")
+        strategies = (
+            ('greedy, arrival order', lambda: greedy_allocate(arrival, expiries)),
+            ('greedy, priority order', lambda: greedy_allocate(requests, expiries)),
+            ('scheduler', lambda: plan_allocation(requests, stock)[0]),
+        )
+        for label, solve in strategies:
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                plan = solve()
+                timings.append(time.perf_counter() - started)
+            self.report(label, plan, min(timings) * 1000)
+
+    def synthetic_stock(self, demand, ratio, rng):
+        today = timezone.localdate()
+        shelf_life = SHELF_LIFE['WHOLE_BLOOD'].days
+        return {
+            group: sorted(
+                today + timedelta(days=rng.randint(0, shelf_life)) for _ in range(round(demand[group] * ratio))
+            )
+            for group, _ in BLOOD_GROUP_CHOICES
+        }
+
+    def report(self, label, plan, best_ms):
+        universal = sum(
+            groups.get('O-', 0) for request, groups in plan if request.blood_group != 'O-'
+        )
+        self.stdout.write(f"\n{label}: best {best_ms:.1f} ms, {universal} O- units given to other groups")
+        for urgency, row in summarize(plan).items():
+            self.stdout.write(
+                f"  {urgency:<9} {row['allocated']:>6}/{row['needed']:<6} units  "
+                f"{row['covered']:>5}/{row['requests']:<5} requests covered"
+            )
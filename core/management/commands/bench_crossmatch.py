@@ -0,0 +1,50 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from core.models import BLOOD_GROUP_CHOICES
+
+
+class Command(BaseCommand):
+    help = "Measure crossmatch pairs per second through the single and batch API endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pairs', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        client = Client()
+        groups = [bg for bg, _ in BLOOD_GROUP_CHOICES]
+        rng = random.Random(0)
+        pairs = [(rng.choice(groups), rng.choice(groups)) for _ in range(options['pairs'])]
+
+        started = time.perf_counter()
+        single = []
+        for patient_bg, donor_bg in pairs:
+            response = client.get(reverse('core:crossmatch_api'), {'patient_bg': patient_bg, 'donor_bg': donor_bg})
+            single.append(response.json()['is_compatible'])
+        single_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batched = []
+        size = options['batch_size']
+        for i in range(0, len(pairs), size):
+            body = {'pairs': [{'patient_bg': p, 'donor_bg': d} for p, d in pairs[i:i + size]]}
+            response = client.post(reverse('core:crossmatch_batch_api'), json.dumps(body),
+                                   content_type='application/json')
+            batched += [r['is_compatible'] for r in response.json()['results']]
+        batch_elapsed = time.perf_counter() - started
+
+        if single != batched:
+            self.stderr.write(self.style.ERROR("Single and batch answers differ."))
+        self.stdout.write(f"single: {len(pairs) / single_elapsed:,.0f} pairs/s ({len(pairs)} calls)")
+        self.stdout.write(
+            f" batch: {len(pairs) / batch_elapsed:,.0f} pairs/s "
+            f"({-(-len(pairs) // size)} calls of up to {size})"
+        )
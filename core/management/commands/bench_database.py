@@ -0,0 +1,144 @@
+import logging
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Donor, BloodRequest, BloodUnit
+from core.utils import recount_inventory
+
+MARKER = 'bench-database'
+
+# What the SQLite profiles compare against: Django's defaults before
+# SQLITE_PRAGMAS, i.e. rollback journal, full fsync and Python's 5 s busy wait.
+SQLITE_DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}
+
+
+def profiles(vendor):
+    """{name: (CONN_MAX_AGE, SQLITE_PRAGMAS)} for the configured database."""
+    if vendor == 'sqlite':
+        return {
+            'sqlite-default': (0, SQLITE_DEFAULT_PRAGMAS),
+            'sqlite-persistent': (600, SQLITE_DEFAULT_PRAGMAS),
+            'sqlite-wal': (600, settings.SQLITE_PRAGMAS),
+        }
+    return {
+        f'{vendor}-per-request': (0, {}),
+        f'{vendor}-persistent': (600, {}),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests per second through the test client, from several threads, for each "
+        "database profile: connection per request or persistent, and for SQLite the default "
+        "journal or WAL with SQLITE_PRAGMAS. Writes test donations and removes them again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per profile.")
+        parser.add_argument('--writes', type=float, default=0.2, help="Fraction of requests that are donations.")
+        parser.add_argument('--profile', nargs='+', help="Run only these profiles.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        available = profiles(connection.vendor)
+        selected = options['profile'] or list(available)
+        unknown = set(selected) - set(available)
+        if unknown:
+            raise CommandError(f"Unknown profiles for {connection.vendor}: {', '.join(sorted(unknown))}")
+        blood_request = BloodRequest.objects.order_by('-created_at').first()
+        if blood_request is None:
+            raise CommandError("No blood request to read; run seed_bench first.")
+
+        user, _ = get_user_model().objects.get_or_create(username=MARKER, defaults={'is_staff': True})
+        donor = Donor.objects.create(name=MARKER, age=30, phone='0000000000', address=MARKER, blood_group='O+')
+        urls = [
+            reverse('core:dashboard'),
+            reverse('core:request_detail', args=[blood_request.pk]),
+            reverse('core:inventory_api'),
+        ]
+        donation = {
+            'donor': donor.pk, 'blood_group': donor.blood_group, 'units': 1,
+            'donation_date': timezone.localdate().isoformat(), 'component': 'WHOLE_BLOOD',
+        }
+        db_settings = connections.settings[DEFAULT_DB_ALIAS]
+        original_max_age = db_settings['CONN_MAX_AGE']
+        try:
+            for name in selected:
+                max_age, pragmas = available[name]
+                db_settings['CONN_MAX_AGE'] = max_age
+                connections.close_all()
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    result = self.run_profile(user, urls, donation, options)
+                self.report(name, result)
+        finally:
+            db_settings['CONN_MAX_AGE'] = original_max_age
+            connections.close_all()
+            BloodUnit.objects.filter(donation__donor=donor).delete()
+            donor.delete()
+            user.delete()
+            recount_inventory()
+
+    def run_profile(self, user, urls, donation, options):
+        deadline = time.perf_counter() + options['duration']
+        latencies, errors = [], []
+        lock = threading.Lock()
+        donation_url = reverse('core:donation_create')
+
+        def worker(seed):
+            rng = random.Random(seed)
+            client = Client()
+            client.force_login(user)
+            mine, failed = [], []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    if rng.random() < options['writes']:
+                        response = client.post(donation_url, donation)
+                        ok = response.status_code == 302
+                    else:
+                        response = client.get(rng.choice(urls))
+                        ok = response.status_code == 200
+                    if not ok:
+                        failed.append(f"status {response.status_code}")
+                except Exception as exc:  # noqa: BLE001 - every failure counts against the profile
+                    failed.append(str(exc))
+                mine.append(time.perf_counter() - started)
+            connections.close_all()
+            with lock:
+                latencies.extend(mine)
+                errors.extend(failed)
+
+        threads = [threading.Thread(target=worker, args=(options['seed'] + i,)) for i in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return {'elapsed': elapsed, 'latencies': sorted(latencies), 'errors': errors}
+
+    def report(self, name, result):
+        latencies = result['latencies']
+        count = len(latencies)
+        p99 = latencies[min(count - 1, int(count * 0.99))] * 1000 if count else 0
+        median = statistics.median(latencies) * 1000 if count else 0
+        self.stdout.write(
+            f"{name:<22} {count / result['elapsed']:>7.1f} req/s  p50 {median:>7.2f} ms  "
+            f"p99 {p99:>8.2f} ms  {len(result['errors'])} errors"
+        )
+        for error in sorted(set(result['errors']))[:3]:
+            self.stdout.write(f"  {error}")
@@ -0,0 +1,179 @@
+import asyncio
+import resource
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.events import broker
+
+MARKER = 'bench-events'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Recorder:
+    """Receive times per event id, across every subscriber."""
+
+    def __init__(self):
+        self.arrivals = {}
+
+    def feed(self, data):
+        now = time.perf_counter()
+        for line in data.split(b'\n'):
+            if line.startswith(b'id: '):
+                self.arrivals.setdefault(int(line[4:]), []).append(now)
+
+
+async def asgi_subscriber(app, cookie, recorder, stop):
+    """Drive the ASGI application directly, without sockets."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': settings.EVENT_STREAM_URL, 'raw_path': settings.EVENT_STREAM_URL.encode(),
+        'query_string': b'', 'root_path': '', 'headers': [(b'cookie', cookie)],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+
+    async def receive():
+        await stop.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            recorder.feed(message.get('body', b''))
+
+    await app(scope, receive, send)
+
+
+async def http_subscriber(host, port, cookie, recorder):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f"GET {settings.EVENT_STREAM_URL} HTTP/1.1\r\nHost: {host}\r\n".encode()
+        + b"Cookie: " + cookie + b"\r\nAccept: text/event-stream\r\n\r\n"
+    )
+    await writer.drain()
+    buffered = b''
+    try:
+        while data := await reader.read(65536):
+            # Keep a partial trailing line for the next read.
+            buffered, _, tail = (buffered + data).rpartition(b'\n')
+            recorder.feed(buffered)
+            buffered = tail
+    finally:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many concurrent event-stream subscribers, publish events from a worker "
+        "thread and report fan-out latency per event."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=0.05, help="Seconds between events.")
+        parser.add_argument('--transport', choices=['asgi', 'http'], default='asgi',
+                            help="asgi calls the application in-process; http serves it with uvicorn "
+                                 "on localhost and connects over TCP.")
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        if not settings.EVENT_STREAM_URL:
+            raise CommandError("Set EVENT_STREAM_URL (e.g. /events/) to serve the event stream.")
+        user, _ = get_user_model().objects.get_or_create(username=MARKER)
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}".encode()
+        try:
+            asyncio.run(self.run(cookie, options))
+        finally:
+            client.logout()
+            user.delete()
+
+    async def run(self, cookie, options):
+        from bloodbank_project.asgi import application
+
+        loop = asyncio.get_running_loop()
+        recorder = Recorder()
+        stop = asyncio.Event()
+        server = None
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        if options['transport'] == 'http':
+            import uvicorn
+
+            config = uvicorn.Config(application, port=options['port'], log_level='warning', lifespan='off',
+                                    backlog=max(2048, options['connections']))
+            server = uvicorn.Server(config)
+            # The server gets its own thread and loop so the clients don't slow it down.
+            server_thread = threading.Thread(target=server.run, daemon=True)
+            server_thread.start()
+            while not server.started:
+                await asyncio.sleep(0.05)
+
+            def subscriber():
+                return http_subscriber('127.0.0.1', options['port'], cookie, recorder)
+        else:
+            def subscriber():
+                return asgi_subscriber(application, cookie, recorder, stop)
+
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(subscriber()) for _ in range(options['connections'])]
+        while len(broker) < options['connections'] and time.perf_counter() - started < 60:
+            await asyncio.sleep(0.05)
+        connect_elapsed = time.perf_counter() - started
+        subscribers = len(broker)
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        published = {}
+        for n in range(options['events']):
+            # Publish from a worker thread, like a signal handler in a sync view would.
+            event = await loop.run_in_executor(None, broker.publish, 'bench', {'n': n})
+            published[event.id] = event.published_at
+            await asyncio.sleep(options['interval'])
+        await asyncio.sleep(max(1.0, options['interval']))
+
+        stop.set()
+        if server is not None:
+            for task in tasks:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if server is not None:
+            server.should_exit = True
+            server_thread.join()
+
+        deliveries, fan_out, missing = [], [], 0
+        for event_id, published_at in published.items():
+            arrivals = recorder.arrivals.get(event_id, [])
+            missing += subscribers - len(arrivals)
+            deliveries += [(t - published_at) * 1000 for t in arrivals]
+            if arrivals:
+                fan_out.append((max(arrivals) - published_at) * 1000)
+
+        self.stdout.write(
+            f"{subscribers} concurrent subscribers ({options['transport']}) connected in {connect_elapsed:.2f}s, "
+            f"~{max(rss_after - rss_before, 0) / max(subscribers, 1):.1f} KiB peak RSS each"
+        )
+        if not deliveries:
+            self.stderr.write(self.style.ERROR("No events were delivered."))
+            return
+        self.stdout.write(
+            f"{len(published)} events, {len(deliveries)} deliveries, {missing} missing"
+        )
+        self.stdout.write(
+            "per delivery ms: "
+            f"p50 {percentile(deliveries, 50):.2f}  p95 {percentile(deliveries, 95):.2f}  "
+            f"p99 {percentile(deliveries, 99):.2f}  max {max(deliveries):.2f}"
+        )
+        self.stdout.write(
+            "per event (last subscriber) ms: "
+            f"mean {statistics.mean(fan_out):.2f}  p95 {percentile(fan_out, 95):.2f}  max {max(fan_out):.2f}"
+        )
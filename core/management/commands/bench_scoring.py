@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Donor, BloodRequest, eligible_on
+from core.utils import calculate_donor_score, compatible_donor_groups, prioritize_donors_for_request
+
+
+def legacy_prioritize(request, limit=20):
+    # The per-instance approach: full model rows, one score call per donor, full sort.
+    donors = Donor.objects.filter(
+        eligible_on(timezone.now().date()),
+        blood_group__in=compatible_donor_groups(request.blood_group), is_available=True,
+    )
+    scored = [(d, d.blood_group == request.blood_group, calculate_donor_score(d, request)) for d in donors]
+    scored.sort(key=lambda x: (x[1], x[2]), reverse=True)
+    return [d for d, _, s in scored[:limit] if s > 0]
+
+
+class Command(BaseCommand):
+    help = "Compare per-instance and batched donor prioritization on the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--request-id', type=int, help="BloodRequest to rank donors for (default: latest).")
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['request_id']:
+            request = BloodRequest.objects.filter(pk=options['request_id']).first()
+        else:
+            request = BloodRequest.objects.order_by('-created_at').first()
+        if request is None:
+            raise CommandError("No blood request found to benchmark against.")
+
+        limit = options['limit']
+        candidates = Donor.objects.filter(
+            eligible_on(timezone.now().date()),
+            blood_group__in=compatible_donor_groups(request.blood_group), is_available=True,
+        ).count()
+        self.stdout.write(f"Request #{request.pk} ({request.blood_group}), {candidates} candidate donors")
+
+        results = {}
+        for label, func in (('legacy', legacy_prioritize), ('batched', prioritize_donors_for_request)):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                ranking = func(request, limit=limit)
+                timings.append(time.perf_counter() - start)
+            results[label] = [d.pk for d in ranking]
+            best = min(timings) * 1000
+            self.stdout.write(f"{label:>8}: best {best:.1f} ms over {options['repeat']} runs")
+
+        if results['legacy'] != results['batched']:
+            raise CommandError(f"Rankings differ: {results['legacy']} != {results['batched']}")
+        self.stdout.write(self.style.SUCCESS("Rankings identical."))
@@ -0,0 +1,85 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from core.models import Donor
+from core.testing import ADMIN_QUERY_BUDGETS, QueryBudgetExceeded, assert_max_queries
+
+MARKER = 'check-admin-queries'
+
+
+def changelist_cases():
+    """(model label, query parameters) for every changelist variant checked."""
+    donor = Donor.objects.exclude(city='').order_by('-pk').only('name', 'phone', 'city').first()
+    cases = [
+        ('core.donor', {}),
+        ('core.donor', {'blood_group': 'O-'}),
+        ('core.donor', {'is_available__exact': '1', 'p': '20'}),
+        ('core.bloodunit', {}),
+        ('core.bloodunit', {'status': 'AVAILABLE'}),
+        ('core.bloodrequest', {}),
+        ('core.bloodrequest', {'status': 'PENDING', 'urgency': 'CRITICAL'}),
+        ('core.donation', {}),
+        ('core.donation', {'blood_group': 'O+'}),
+        ('core.notificationlog', {}),
+        ('core.notificationlog', {'channel': 'sms', 'p': '20'}),
+    ]
+    if donor is not None:
+        cases += [
+            ('core.donor', {'city': donor.city}),
+            ('core.donor', {'q': donor.name[:4]}),
+            ('core.donor', {'q': donor.phone[:6]}),
+        ]
+    return cases
+
+
+class Command(BaseCommand):
+    help = (
+        "Load each admin changelist, plain, filtered, searched and paged, with a cold cache "
+        "and fail if any runs more queries than core.testing.ADMIN_QUERY_BUDGETS allows."
+    )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        user, _ = get_user_model().objects.get_or_create(
+            username=MARKER, defaults={'is_staff': True, 'is_superuser': True},
+        )
+        client = Client()
+        client.force_login(user)
+        failures = []
+        try:
+            for label, params in changelist_cases():
+                failure = self.check_changelist(client, label, params)
+                if failure:
+                    failures.append(failure)
+        finally:
+            user.delete()
+        if failures:
+            raise CommandError(f"{len(failures)} changelists over their query budget:\n" + "\n\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("All changelists are within their query budgets."))
+
+    def check_changelist(self, client, label, params):
+        app_label, model_name = label.split('.')
+        url = reverse(f'admin:{app_label}_{model_name}_changelist')
+        query = '&'.join(f"{key}={value}" for key, value in params.items())
+        name = f"{label} {query}".strip()
+        for cache in caches.all():
+            cache.clear()
+        started = time.perf_counter()
+        try:
+            with assert_max_queries(ADMIN_QUERY_BUDGETS[label], label=name) as captured:
+                response = client.get(url, params)
+        except QueryBudgetExceeded as exc:
+            self.stdout.write(self.style.ERROR(f"OVER       {name}"))
+            return str(exc)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            self.stdout.write(self.style.ERROR(f"FAILED     {name}: status {response.status_code}"))
+            return f"{name} returned {response.status_code}"
+        self.stdout.write(f"ok         {name:<55} {len(captured):>2} queries  {elapsed:>7.1f} ms")
+        return None
@@ -0,0 +1,71 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.models import Donor, BloodRequest, Donation, eligible_on
+from core.geo import cells_covering
+from core.search import prefix_range
+from core.utils import donor_candidates
+
+PAGE = 50
+
+
+def hot_queries():
+    sample = BloodRequest(blood_group='AB+', location='')
+    today = timezone.now().date()
+    return [
+        ('prioritize_donors_for_request', donor_candidates(sample)),
+        ('patient_qr_view', Donor.objects.filter(eligible_on(today), is_available=True, blood_group='O-')),
+        ('patient_qr_view_nearby', Donor.objects.filter(grid_cell__in=cells_covering(18.52, 73.86, 25))),
+        ('donor_list', Donor.objects.order_by('-created_at', '-id')[:PAGE]),
+        ('donor_city_filter', Donor.objects.filter(city='Pune')),
+        ('donor_phone_search', Donor.objects.filter(prefix_range('phone_normalized', '70000')).order_by('phone_normalized')),
+        ('request_list', BloodRequest.objects.order_by('-created_at', '-id')[:PAGE]),
+        ('dashboard_pending', BloodRequest.objects.filter(status='PENDING')),
+        ('dashboard_donations', Donation.objects.values('blood_group').annotate(total_units=Sum('units'))),
+    ]
+
+
+def full_scans(plan, vendor):
+    lines = [line.strip() for line in plan.splitlines()]
+    if vendor == 'postgresql':
+        return [line for line in lines if 'Seq Scan' in line]
+    # SQLite: "SCAN <table>" without USING INDEX reads every row, and a temp
+    # b-tree for ORDER BY means the ordering index was not picked up.
+    return [
+        line for line in lines
+        if re.search(r'\bSCAN \w+$', line) or 'USE TEMP B-TREE FOR ORDER BY' in line
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every hot query and fail if any of them falls back to a full table scan."
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Unsupported database backend: {vendor}")
+
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # Small tables are cheaper to seq-scan; ask whether an index *can* be used.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, queryset in hot_queries():
+                plan = queryset.explain()
+                scans = full_scans(plan, vendor)
+                if scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}: {'; '.join(scans)}"))
+                else:
+                    self.stdout.write(f"ok         {name}")
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries regressed to a full scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
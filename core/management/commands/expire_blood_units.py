@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.utils import expire_units, recount_inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark available blood units past their expiry date as expired and take them out of "
+        "the inventory counts. Run it daily; --recount also rebuilds the counts from the unit table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help="Reset BloodInventory from the available units afterwards.")
+
+    def handle(self, *args, **options):
+        expired = expire_units()
+        total = sum(expired.values())
+        details = ', '.join(f"{group}: {n}" for group, n in sorted(expired.items()))
+        self.stdout.write(f"Expired {total} units" + (f" ({details})." if details else "."))
+        if options['recount']:
+            changed = recount_inventory()
+            for group, (old, new) in sorted(changed.items()):
+                self.stdout.write(f"{group}: {old} -> {new}")
+            self.stdout.write(f"Recounted inventory; {len(changed)} groups corrected.")
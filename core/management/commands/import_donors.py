@@ -0,0 +1,155 @@
+import csv
+import json
+import sys
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.dashboard import invalidate_dashboard_snapshot
+from core.forms import DonorForm
+from core.models import Donor, normalize_phone
+from core.ranking import bump_donor_pool
+from core.search import index_donors
+from core.utils import bulk_update_rows
+
+# Required on the form but defaulted on the model, so a blank cell may be left out too.
+MODEL_DEFAULTS = {'city'}
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def clean_rows(rows, fields):
+    """Yield (line, cleaned_data, errors) using the DonorForm field validators directly.
+
+    cleaned_data holds only the columns the row fills in. A missing or blank
+    optional column is left out rather than cleaned to None, so it keeps the
+    existing donor's value, or the model default for a new donor.
+    """
+    for line, row in enumerate(rows, start=1):
+        cleaned, errors = {}, {}
+        for name, field in fields.items():
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value in (None, '') and (not field.required or name in MODEL_DEFAULTS):
+                continue
+            try:
+                cleaned[name] = field.clean(value)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+        yield line, cleaned, errors
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def upsert(batch, update_fields):
+    # The normalized phone number is the natural key, so "+91 98765 43210" and
+    # "9876543210" are one donor; within a batch the last row wins.
+    by_phone = {normalize_phone(data['phone']) or data['phone']: data for data in batch}
+    # Ordered so that of donors already sharing a number, the oldest is updated.
+    existing = dict(
+        Donor.objects.filter(phone_normalized__in=by_phone).exclude(phone_normalized='')
+        .order_by('-id').values_list('phone_normalized', 'id')
+    )
+    now = timezone.now()
+    to_create = []
+    # Existing donors, grouped by the columns their row supplies.
+    to_update = defaultdict(list)
+    for phone, data in by_phone.items():
+        if phone in existing:
+            donor = Donor(id=existing[phone], updated_at=now, **data)
+            fields = [name for name in update_fields if name in data]
+            if 'city' in data:
+                fields += ['latitude', 'longitude', 'grid_cell']
+            if 'last_donation_date' in data:
+                fields += ['next_eligible_date']
+            to_update[tuple(fields)].append(donor)
+        else:
+            donor = Donor(**data)
+            to_create.append(donor)
+        # bulk writes skip Donor.save(), which normally fills these in; only
+        # the ones whose source column was supplied are written for updates.
+        donor.refresh_derived_fields()
+    with transaction.atomic():
+        Donor.objects.bulk_create(to_create)
+        # Like the derived fields, bulk writes skip the signals that index names.
+        index_donors(to_create)
+        for fields, donors in to_update.items():
+            bulk_update_rows(Donor, donors, [*fields, 'updated_at'])
+            if 'name' in fields:
+                index_donors(donors)
+    return len(to_create), sum(len(donors) for donors in to_update.values())
+
+
+class Command(BaseCommand):
+    help = "Stream donors from CSV or JSON lines into the database, upserting on the normalized phone number."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; write nothing.")
+        parser.add_argument('--max-errors', type=int, default=100, help="Abort after this many invalid rows.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        fields = DonorForm.base_fields
+        update_fields = [name for name in fields if name != 'phone']
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        created = updated = invalid = 0
+        started = time.perf_counter()
+
+        def valid_rows():
+            nonlocal invalid
+            for line, cleaned, errors in clean_rows(read_rows(stream, fmt), fields):
+                if errors:
+                    invalid += 1
+                    self.stderr.write(f"Row {line}: {json.dumps(errors)}")
+                    if invalid >= options['max_errors']:
+                        raise CommandError(f"Aborting after {invalid} invalid rows.")
+                    continue
+                yield cleaned
+
+        try:
+            for batch in batched(valid_rows(), options['batch_size']):
+                if options['dry_run']:
+                    created += len(batch)
+                    continue
+                c, u = upsert(batch, update_fields)
+                created += c
+                updated += u
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{created + updated} rows written...")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if created or updated:
+                invalidate_dashboard_snapshot()
+                # Bulk writes skip the signals that bump it per donor.
+                bump_donor_pool()
+
+        elapsed = time.perf_counter() - started
+        total = created + updated + invalid
+        verb = "would be imported" if options['dry_run'] else f"created, {updated} updated"
+        self.stdout.write(
+            f"{created} {verb}, {invalid} invalid: {total} rows in {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:.0f} rows/s)"
+        )
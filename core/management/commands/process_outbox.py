@@ -0,0 +1,56 @@
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.notifications import claim_outbox_batch, deliver_outbox_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued email/SMS notifications from the outbox with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain what is due now and exit.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        totals = {'sent': 0, 'processed': 0}
+        lock = threading.Lock()
+
+        def work():
+            try:
+                while not stop.is_set():
+                    batch = claim_outbox_batch(options['batch_size'])
+                    if not batch:
+                        if options['once']:
+                            return
+                        stop.wait(options['interval'])
+                        continue
+                    sent = deliver_outbox_batch(batch)
+                    with lock:
+                        totals['sent'] += sent
+                        totals['processed'] += len(batch)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(work) for _ in range(options['workers'])]
+            try:
+                # Returns as soon as any worker fails, so one dead worker stops them all.
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            except KeyboardInterrupt:
+                done = ()
+            stop.set()
+            for future in done:
+                future.result()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Processed {totals['processed']} notifications ({totals['sent']} sent) in {elapsed:.2f}s"
+        )
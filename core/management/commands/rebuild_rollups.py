@@ -0,0 +1,52 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from core.models import Donation, BloodRequest
+from core.rollups import rebuild_range
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily rollup tables from Donation and BloodRequest history, "
+        "one date range per transaction. Run it once after migrating and after bulk loads "
+        "that bypass signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help="First day (YYYY-MM-DD); defaults to the oldest row.")
+        parser.add_argument('--until', type=date.fromisoformat, help="Last day, inclusive; defaults to today.")
+        parser.add_argument('--chunk-days', type=int, default=31)
+
+    def handle(self, *args, **options):
+        until = options['until'] or timezone.localdate()
+        since = options['since'] or self.oldest_day()
+        if since is None:
+            self.stdout.write("Nothing to roll up.")
+            return
+        if since > until:
+            raise CommandError("--since is after --until.")
+
+        started = time.perf_counter()
+        step = timedelta(days=options['chunk_days'])
+        chunks = 0
+        start = since
+        while start <= until:
+            end = min(start + step, until + timedelta(days=1))
+            rebuild_range(start, end)
+            chunks += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Rebuilt {start} to {end - timedelta(days=1)}")
+            start = end
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Rebuilt rollups from {since} to {until} in {chunks} chunks ({elapsed:.2f}s).")
+
+    def oldest_day(self):
+        first_donation = Donation.objects.aggregate(day=Min('donation_date'))['day']
+        first_request = BloodRequest.objects.aggregate(at=Min('created_at'))['at']
+        days = [d for d in (first_donation, first_request and timezone.localdate(first_request)) if d]
+        return min(days) if days else None
@@ -0,0 +1,185 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Donor, BloodRequest, Donation, NotificationLog
+from core.testing import QUERY_BUDGETS
+from core.utils import prioritize_donors_for_request
+
+MARKER = 'run-benchmarks'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot views through the test client and report latency percentiles and "
+        "query counts. Seed data with seed_bench first; --output saves JSON for --compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='+', help="Run only these benchmarks.")
+        parser.add_argument('--cold-cache', action='store_true', help="Clear every cache before every call.")
+        parser.add_argument('--output', help="Write results to this JSON file.")
+        parser.add_argument('--compare', help="Show the change against an earlier JSON result file.")
+        parser.add_argument('--check-budgets', action='store_true',
+                            help="Fail if a view runs more queries than core.testing.QUERY_BUDGETS allows.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        request = BloodRequest.objects.filter(status='PENDING').order_by('-created_at').first()
+        if request is None:
+            raise CommandError("No pending blood request to benchmark against; run seed_bench first.")
+        user, _ = get_user_model().objects.get_or_create(username=MARKER, defaults={'is_staff': True})
+        client = Client()
+        client.force_login(user)
+
+        benchmarks = self.benchmarks(client, request)
+        if options['only']:
+            unknown = set(options['only']) - set(benchmarks)
+            if unknown:
+                raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+            benchmarks = {name: benchmarks[name] for name in options['only']}
+
+        results = {}
+        over_budget = []
+        try:
+            for name, (call, url_name) in benchmarks.items():
+                results[name] = self.measure(call, options)
+                self.report(name, results[name])
+                budget = QUERY_BUDGETS.get(url_name)
+                if budget is not None and results[name]['queries_max'] > budget:
+                    over_budget.append(f"{name}: {results[name]['queries_max']} queries, budget {budget}")
+        finally:
+            user.delete()
+
+        payload = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'iterations': options['iterations'],
+                'cold_cache': options['cold_cache'],
+                'rows': {
+                    'donors': Donor.objects.count(),
+                    'donations': Donation.objects.count(),
+                    'requests': BloodRequest.objects.count(),
+                    'notification_logs': NotificationLog.objects.count(),
+                },
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                json.dump(payload, out, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+        if options['compare']:
+            self.compare(options['compare'], results)
+        if options['check_budgets'] and over_budget:
+            raise CommandError("Query budgets exceeded:\n  " + "\n  ".join(over_budget))
+
+    def benchmarks(self, client, blood_request):
+        def get(name, *args, **params):
+            url = reverse(f'core:{name}', args=args)
+            return (lambda: self.check_response(client.get(url, params))), f'core:{name}'
+
+        def assign():
+            # Rolled back, so every iteration issues against the same stock and request.
+            with transaction.atomic():
+                self.check_response(client.post(
+                    reverse('core:assign_donors', args=[blood_request.pk]), {'units_to_issue': 1},
+                ), expect=(200, 302))
+                transaction.set_rollback(True)
+
+        city = blood_request.location.split(',')[-1].strip()
+        donor = Donor.objects.exclude(name='').only('name', 'phone').latest('pk')
+        return {
+            'prioritize_donors_for_request': ((lambda: prioritize_donors_for_request(blood_request)), None),
+            'dashboard': get('dashboard'),
+            'donor_list': get('donor_list'),
+            'donor_list_filtered': get('donor_list', blood_group=blood_request.blood_group, city=city),
+            'request_list': get('request_list'),
+            'patient_qr_view': get('patient_qr', blood_group=blood_request.blood_group, city=city),
+            'request_detail': get('request_detail', blood_request.pk),
+            'assign_donors_get': get('assign_donors', blood_request.pk),
+            'assign_donors_post': (assign, 'core:assign_donors'),
+            'crossmatch_api': get('crossmatch_api', patient_bg=blood_request.blood_group, donor_bg='O-'),
+            'donor_search_name': get('donor_search_api', q=donor.name.split()[0][:4]),
+            'donor_search_phone': get('donor_search_api', q=donor.phone[:6]),
+        }
+
+    def check_response(self, response, expect=(200,)):
+        if response.status_code not in expect:
+            raise CommandError(f"{response.request['PATH_INFO']} returned {response.status_code}")
+        # Drain streaming responses so their rendering is timed too.
+        if response.streaming:
+            b''.join(response.streaming_content)
+
+    def measure(self, call, options):
+        for _ in range(options['warmup']):
+            call()
+        timings, queries = [], []
+        for _ in range(options['iterations']):
+            if options['cold_cache']:
+                for cache in caches.all():
+                    cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        return {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p90_ms': round(percentile(timings, 90), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': statistics.median_low(queries),
+            'queries_max': max(queries),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<32} p50 {result['p50_ms']:>9.2f}  p90 {result['p90_ms']:>9.2f}  "
+            f"p99 {result['p99_ms']:>9.2f} ms  {result['queries']:>4} queries"
+        )
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as previous_file:
+            previous = json.load(previous_file)
+        self.stdout.write(f"\nAgainst {path} (commit {previous['meta'].get('commit')}):")
+        for name, result in results.items():
+            before = previous['results'].get(name)
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            self.stdout.write(
+                f"{name:<32} p50 {before['p50_ms']:>9.2f} -> {result['p50_ms']:>9.2f} ms ({change:+.0f}%)  "
+                f"queries {before['queries']} -> {result['queries']}"
+            )
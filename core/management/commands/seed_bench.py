@@ -0,0 +1,232 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.dashboard import invalidate_dashboard_snapshot
+from core.geo import GAZETTEER
+from core.models import (
+    Donor,
+    Donation,
+    BloodRequest,
+    BloodUnit,
+    NotificationLog,
+    BLOOD_GROUP_CHOICES,
+    SHELF_LIFE,
+)
+from core.ranking import bump_donor_pool
+from core.search import index_donors
+from core.utils import bulk_update_rows, recount_inventory
+
+MARKER = 'seed-bench'
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# Rough population frequencies, so the rare groups stay rare.
+BLOOD_GROUP_WEIGHTS = {'O+': 37, 'B+': 32, 'A+': 22, 'AB+': 7, 'O-': 0.8, 'B-': 0.6, 'A-': 0.4, 'AB-': 0.2}
+URGENCY_WEIGHTS = {'LOW': 20, 'MEDIUM': 45, 'HIGH': 25, 'CRITICAL': 10}
+STATUS_WEIGHTS = {'PENDING': 20, 'PARTIAL': 5, 'FULFILLED': 65, 'CANCELLED': 10}
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Amit', 'Ananya', 'Arjun', 'Deepa', 'Divya', 'Farhan', 'Gita', 'Harsh',
+    'Isha', 'Karan', 'Kavya', 'Manoj', 'Meera', 'Neha', 'Nikhil', 'Pooja', 'Priya', 'Rahul',
+    'Ravi', 'Rohan', 'Sanjay', 'Shreya', 'Sneha', 'Suresh', 'Tanvi', 'Varun', 'Vikram', 'Zoya',
+]
+LAST_NAMES = [
+    'Agarwal', 'Bhat', 'Das', 'Gupta', 'Iyer', 'Joshi', 'Khan', 'Kumar', 'Menon', 'Mishra',
+    'Nair', 'Patel', 'Rao', 'Reddy', 'Shah', 'Sharma', 'Singh', 'Verma',
+]
+
+
+def weighted(rng, weights):
+    keys = list(weights)
+    return lambda: rng.choices(keys, weights.values())[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic donors, donations, requests and notification logs "
+        "for benchmarking. Rows are tagged so --flush can remove them again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(SIZES), default='10k', help="Number of donors.")
+        parser.add_argument('--donors', type=int, help="Exact donor count; overrides --size.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--flush', action='store_true', help="Delete previously seeded rows and stop.")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            self.flush()
+            return
+
+        self.verbosity = options['verbosity']
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.today = timezone.localdate()
+        self.now = timezone.now()
+        donors = options['donors'] or SIZES[options['size']]
+        started = time.perf_counter()
+
+        donor_rows = self.seed_donors(donors)
+        self.seed_donations(donor_rows, donors)
+        self.seed_requests(donor_rows, max(donors // 10, 1))
+        self.seed_notification_logs(donors)
+        self.seed_inventory()
+
+        call_command('rebuild_rollups', verbosity=0)
+        invalidate_dashboard_snapshot()
+        bump_donor_pool()
+        self.stdout.write(f"Seeded {donors} donors and related rows in {time.perf_counter() - started:.1f}s.")
+
+    def progress(self, label, done, total):
+        if self.verbosity > 1:
+            self.stdout.write(f"{label}: {done}/{total}")
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def seed_donors(self, total):
+        rng = self.rng
+        blood_group = weighted(rng, BLOOD_GROUP_WEIGHTS)
+        cities = [name.title() for name in GAZETTEER]
+        offset = Donor.objects.filter(address=MARKER).count()
+        for start, size in self.batches(total):
+            donors = []
+            for i in range(start + offset, start + offset + size):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                donated = rng.random() < 0.6
+                donor = Donor(
+                    name=f"{first} {last}",
+                    age=rng.randint(18, 65),
+                    phone=f"7{i:09d}",
+                    email=f"{first}.{last}.{i}@example.com".lower() if rng.random() < 0.7 else None,
+                    address=MARKER,
+                    city=rng.choice(cities),
+                    blood_group=blood_group(),
+                    last_donation_date=self.today - timedelta(days=rng.randint(1, 720)) if donated else None,
+                    total_donations=rng.randint(1, 30) if donated else 0,
+                    is_available=rng.random() < 0.85,
+                    reputation_points=rng.randint(0, 300),
+                    responsiveness_score=round(rng.random(), 2),
+                )
+                # bulk_create skips save(), which fills these in.
+                donor.refresh_derived_fields()
+                donors.append(donor)
+            Donor.objects.bulk_create(donors)
+            index_donors(donors)
+            self.progress('donors', start + size, total)
+        return list(Donor.objects.filter(address=MARKER).values_list('pk', 'blood_group'))
+
+    def seed_donations(self, donor_rows, total):
+        rng = self.rng
+        for start, size in self.batches(total):
+            donations = []
+            for _ in range(size):
+                pk, group = rng.choice(donor_rows)
+                donations.append(Donation(
+                    donor_id=pk, blood_group=group, units=rng.randint(1, 2),
+                    donation_date=self.today - timedelta(days=rng.randint(0, 730)),
+                    is_urgent=rng.random() < 0.1,
+                ))
+            Donation.objects.bulk_create(donations)
+            self.progress('donations', start + size, total)
+
+    def seed_requests(self, donor_rows, total):
+        rng = self.rng
+        blood_group = weighted(rng, BLOOD_GROUP_WEIGHTS)
+        urgency = weighted(rng, URGENCY_WEIGHTS)
+        status = weighted(rng, STATUS_WEIGHTS)
+        places = list(GAZETTEER)
+        Assignment = BloodRequest.donors_assigned.through
+        for start, size in self.batches(total):
+            requests = []
+            for i in range(size):
+                place = rng.choice(places).title()
+                request = BloodRequest(
+                    requester_name=MARKER,
+                    contact_phone=f"6{start + i:09d}",
+                    hospital_name=f"{place} General Hospital",
+                    patient_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    patient_age=rng.randint(1, 90),
+                    blood_group=blood_group(),
+                    units_requested=rng.randint(1, 6),
+                    urgency=urgency(),
+                    location=f"{place} General Hospital, {place}",
+                    status=status(),
+                )
+                request.latitude, request.longitude = GAZETTEER[place.lower()]
+                requests.append(request)
+            with transaction.atomic():
+                BloodRequest.objects.bulk_create(requests)
+                # created_at is auto_now_add, so backdate it after the insert.
+                for request in requests:
+                    request.created_at = self.now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+                    if request.status == 'FULFILLED':
+                        request.fulfilled_at = request.created_at + timedelta(minutes=rng.randint(10, 72 * 60))
+                bulk_update_rows(BloodRequest, requests, ['created_at', 'fulfilled_at'])
+                Assignment.objects.bulk_create([
+                    Assignment(bloodrequest_id=request.pk, donor_id=pk)
+                    for request in requests if request.status in ('FULFILLED', 'PARTIAL')
+                    for pk, _ in rng.sample(donor_rows, min(len(donor_rows), rng.randint(1, 3)))
+                ], ignore_conflicts=True)
+            self.progress('requests', start + size, total)
+
+    def seed_notification_logs(self, total):
+        rng = self.rng
+        for start, size in self.batches(total):
+            logs = []
+            for i in range(size):
+                channel = 'email' if rng.random() < 0.6 else 'sms'
+                logs.append(NotificationLog(
+                    recipient=f"donor{start + i}@example.com" if channel == 'email' else f"7{start + i:09d}",
+                    channel=channel,
+                    subject=MARKER,
+                    message="Urgent blood request near you.",
+                    status='SENT' if rng.random() < 0.97 else 'FAILED',
+                ))
+            with transaction.atomic():
+                NotificationLog.objects.bulk_create(logs)
+                for log in logs:
+                    log.created_at = self.now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+                bulk_update_rows(NotificationLog, logs, ['created_at'])
+            self.progress('notification logs', start + size, total)
+
+    def seed_inventory(self):
+        # Stock with staggered collection dates, so FEFO allocation has expiries to choose between.
+        # Each unit comes from a seeded donation of its group, which is how --flush finds it.
+        rng = self.rng
+        donations = dict(
+            Donation.objects.filter(donor__address=MARKER).values('blood_group')
+            .annotate(latest=Max('pk')).values_list('blood_group', 'latest')
+        )
+        units = []
+        for blood_group, _ in BLOOD_GROUP_CHOICES:
+            if blood_group not in donations:
+                continue
+            for _ in range(rng.randint(20, 400)):
+                collected_on = self.today - timedelta(days=rng.randint(0, 34))
+                units.append(BloodUnit(
+                    donation_id=donations[blood_group], blood_group=blood_group, component='WHOLE_BLOOD',
+                    collected_on=collected_on, expires_on=collected_on + SHELF_LIFE['WHOLE_BLOOD'],
+                ))
+        BloodUnit.objects.bulk_create(units, batch_size=self.batch_size)
+        recount_inventory()
+
+    def flush(self):
+        with transaction.atomic():
+            requests = BloodRequest.objects.filter(requester_name=MARKER).delete()[0]
+            logs = NotificationLog.objects.filter(subject=MARKER).delete()[0]
+            # Before the donors: deleting a donation only unlinks its units.
+            units = BloodUnit.objects.filter(donation__donor__address=MARKER).delete()[0]
+            # Deleting donors cascades to their donations.
+            donors = Donor.objects.filter(address=MARKER).delete()[0]
+            recount_inventory()
+        call_command('rebuild_rollups', verbosity=0)
+        invalidate_dashboard_snapshot()
+        self.stdout.write(f"Deleted {donors + requests + logs + units} seeded rows.")
@@ -0,0 +1,143 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core import views
+from core.models import Donor, Donation, BloodInventory, BloodRequest, BloodUnit
+from core.utils import recount_inventory
+
+MARKER = 'stress-inventory'
+
+
+def legacy_donation(donation, component=None):
+    # The original read-modify-write implementation, kept for comparison.
+    inv, _ = BloodInventory.objects.get_or_create(blood_group=donation.blood_group)
+    inv.units_available += donation.units
+    inv.save()
+
+
+def legacy_issue(blood_group, units, blood_request=None):
+    inv, _ = BloodInventory.objects.get_or_create(blood_group=blood_group)
+    if inv.units_available >= units:
+        inv.units_available -= units
+        inv.save()
+        return True
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer donation_create and assign_donors concurrently and check that no inventory "
+        "update is lost. Writes test rows; run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--ops', type=int, default=200, help="Donations and issues each.")
+        parser.add_argument('--blood-group', default='O-')
+        parser.add_argument('--legacy', action='store_true', help="Use the old read-modify-write helpers.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Failures are tallied below; keep django.request from printing every traceback.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        blood_group = options['blood_group']
+        ops = options['ops']
+
+        user, _ = get_user_model().objects.get_or_create(username=MARKER, defaults={'is_staff': True})
+        donor = Donor.objects.create(
+            name=MARKER, age=30, phone='0000000000', address=MARKER, blood_group=blood_group,
+        )
+        requests = BloodRequest.objects.bulk_create([
+            BloodRequest(
+                requester_name=MARKER, contact_phone='0', patient_name=MARKER,
+                blood_group=blood_group, units_requested=1, location=MARKER,
+            )
+            for _ in range(ops)
+        ])
+        inventory, _ = BloodInventory.objects.get_or_create(blood_group=blood_group)
+        start_units = inventory.units_available
+
+        def call(job):
+            kind, arg = job
+            client = Client()
+            client.force_login(user)
+            try:
+                if kind == 'donate':
+                    client.post(reverse('core:donation_create'), {
+                        'donor': donor.pk, 'blood_group': blood_group, 'units': 1,
+                        'donation_date': timezone.localdate().isoformat(), 'component': 'WHOLE_BLOOD',
+                    })
+                else:
+                    client.post(reverse('core:assign_donors', args=[arg]), {'units_to_issue': 1})
+                return None
+            except Exception as exc:  # noqa: BLE001 - report every failure mode
+                return f"{kind}: {exc}"
+            finally:
+                connections.close_all()
+
+        # Interleave donations and issues so both paths contend on the same row.
+        jobs = []
+        for r in requests:
+            jobs += [('donate', None), ('issue', r.pk)]
+
+        patches = []
+        if options['legacy']:
+            patches = [
+                mock.patch.object(views, 'update_inventory_on_donation', legacy_donation),
+                mock.patch.object(views, 'update_inventory_on_issue', legacy_issue),
+            ]
+        for patch in patches:
+            patch.start()
+        try:
+            began = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                errors = [e for e in pool.map(call, jobs) if e]
+            elapsed = time.perf_counter() - began
+        finally:
+            for patch in patches:
+                patch.stop()
+
+        donated = Donation.objects.filter(donor=donor).count()
+        issued = BloodRequest.objects.filter(pk__in=[r.pk for r in requests], status='FULFILLED').count()
+        expected = start_units + donated - issued
+        actual = BloodInventory.objects.get(blood_group=blood_group).units_available
+
+        self.stdout.write(
+            f"{connection.vendor}, {options['threads']} threads: {len(jobs)} requests in {elapsed:.2f}s "
+            f"({len(jobs) / elapsed:.0f} req/s), {len(errors)} errors"
+        )
+        for error in sorted(set(errors))[:5]:
+            self.stdout.write(f"  {error}")
+        self.stdout.write(f"donated {donated}, issued {issued}: expected {expected} units, found {actual}")
+        if not options['legacy']:
+            units = BloodUnit.objects.filter(blood_group=blood_group, status='AVAILABLE').count()
+            self.stdout.write(f"available {blood_group} units in the unit table: {units}")
+            if units != actual:
+                expected = units
+
+        # FEFO issues the oldest stock first, real units included: put those back before
+        # deleting the requests, which would leave them ISSUED to nobody.
+        BloodUnit.objects.filter(issued_to__in=[r.pk for r in requests]).exclude(donation__donor=donor).update(
+            status='AVAILABLE', issued_to=None, issued_at=None,
+        )
+        BloodRequest.objects.filter(pk__in=[r.pk for r in requests]).delete()
+        BloodUnit.objects.filter(donation__donor=donor).delete()
+        donor.delete()
+        if options['legacy']:
+            BloodInventory.objects.filter(blood_group=blood_group).update(units_available=start_units)
+        else:
+            recount_inventory()
+
+        if actual != expected:
+            raise CommandError(f"Lost updates: {expected - actual:+d} units unaccounted for.")
+        self.stdout.write(self.style.SUCCESS("No lost updates."))
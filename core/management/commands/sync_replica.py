@@ -0,0 +1,36 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over each replica alias with SQLite's online backup, "
+        "standing in for replication when trying the read-replica router locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="Keep copying every this many seconds instead of once.")
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured; set DATABASE_REPLICA_URLS.")
+        aliases = [DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS]
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError("sync_replica only copies SQLite files; use the database's own replication.")
+        while True:
+            started = time.perf_counter()
+            with closing(sqlite3.connect(connections.settings[DEFAULT_DB_ALIAS]['NAME'])) as source:
+                for alias in settings.DATABASE_REPLICAS:
+                    with closing(sqlite3.connect(connections.settings[alias]['NAME'])) as target:
+                        source.backup(target)
+            self.stdout.write(f"Copied the primary to {', '.join(settings.DATABASE_REPLICAS)} "
+                              f"in {time.perf_counter() - started:.2f}s.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
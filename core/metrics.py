@@ -0,0 +1,195 @@
+"""Per-view request metrics: query count, SQL time, template time and total time.
+
+MetricsMiddleware measures each request and files the sample under its URL
+name. The last METRICS_WINDOW samples per view are kept in memory, so
+percentiles cover recent traffic in this process only.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99)
+UNRESOLVED = '<unresolved>'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'sql_time', 'template_time', 'template_depth', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            # SQL arrives with placeholders, so the same statement with new parameters counts as a repeat.
+            self.statements[sql] += 1
+
+
+class ViewStats:
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total_time = 0.0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.queries = 0
+        self.n_plus_one = 0
+
+
+class MetricsRegistry:
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, total, metrics, n_plus_one):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats(self.window)
+            stats.samples.append((total, metrics.sql_time, metrics.template_time, metrics.queries))
+            stats.count += 1
+            stats.total_time += total
+            stats.sql_time += metrics.sql_time
+            stats.template_time += metrics.template_time
+            stats.queries += metrics.queries
+            stats.n_plus_one += n_plus_one
+
+    def snapshot(self):
+        """{view: {'count', sums..., 'samples': [...]}} copied under the lock."""
+        with self._lock:
+            return {
+                view: {
+                    'count': stats.count,
+                    'total_time': stats.total_time,
+                    'sql_time': stats.sql_time,
+                    'template_time': stats.template_time,
+                    'queries': stats.queries,
+                    'n_plus_one': stats.n_plus_one,
+                    'samples': list(stats.samples),
+                }
+                for view, stats in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry(getattr(settings, 'METRICS_WINDOW', 1000))
+
+
+def quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0
+
+
+def _collapse_whitespace(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def repeated_statements(metrics, threshold):
+    return [(sql, count) for sql, count in metrics.statements.most_common() if count >= threshold]
+
+
+class MetricsMiddleware:
+    """Record per-URL-name timings; put it first in MIDDLEWARE so the total covers the whole stack."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 10)
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                # Wrappers are per thread and cheap to create; the database connects lazily.
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        repeats = repeated_statements(metrics, self.threshold)
+        for sql, count in repeats:
+            logger.warning("Possible N+1 in %s: %d executions of %s", view, count, _collapse_whitespace(sql)[:300])
+        registry.record(view, total, metrics, len(repeats))
+        return response
+
+
+_original_render = Template.render
+
+
+def _timed_render(self, context):
+    metrics = _current.get()
+    # Only the outermost render is timed; includes and extends are part of it.
+    if metrics is None or metrics.template_depth:
+        return _original_render(self, context)
+    metrics.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        metrics.template_time += time.perf_counter() - started
+        metrics.template_depth -= 1
+
+
+def instrument_templates():
+    Template.render = _timed_render
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """Every view's metrics in the Prometheus text exposition format."""
+    summaries = (
+        ('core_request_duration_seconds', "Total request time by URL name.", 0, 'total_time'),
+        ('core_request_sql_seconds', "Time spent in SQL by URL name.", 1, 'sql_time'),
+        ('core_request_template_seconds', "Template render time by URL name.", 2, 'template_time'),
+        ('core_request_queries', "SQL queries per request by URL name.", 3, 'queries'),
+    )
+    snapshot = sorted(registry.snapshot().items())
+    lines = []
+    for name, help_text, index, total_key in summaries:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+        for view, stats in snapshot:
+            label = f'view="{_escape_label(view)}"'
+            ordered = sorted(sample[index] for sample in stats['samples'])
+            for q in QUANTILES:
+                lines.append(f'{name}{{{label},quantile="{q}"}} {quantile(ordered, q):.6g}')
+            lines.append(f"{name}_sum{{{label}}} {stats[total_key]:.6g}")
+            lines.append(f"{name}_count{{{label}}} {stats['count']}")
+    lines += [
+        "# HELP core_request_n_plus_one_total Requests where one SQL statement repeated past the threshold.",
+        "# TYPE core_request_n_plus_one_total counter",
+    ]
+    for view, stats in snapshot:
+        lines.append(f'core_request_n_plus_one_total{{view="{_escape_label(view)}"}} {stats["n_plus_one"]}')
+    return '\n'.join(lines) + '\n'
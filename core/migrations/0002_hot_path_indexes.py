@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-17 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['status', '-created_at'], name='request_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['-created_at'], name='request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['blood_group', 'units'], name='donation_group_units_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['blood_group', 'is_available'], name='donor_group_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['city'], name='donor_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['-created_at'], name='donor_created_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-17 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bloodrequest',
+            name='request_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='donor',
+            name='donor_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['-created_at', '-id'], name='request_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['-created_at', '-id'], name='donor_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['-created_at', '-id'], name='notiflog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['channel', '-created_at'], name='notiflog_channel_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['status', '-created_at'], name='notiflog_status_created_idx'),
+        ),
+    ]
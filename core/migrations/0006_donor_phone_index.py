@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_notification_log_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['phone'], name='donor_phone_idx'),
+        ),
+    ]
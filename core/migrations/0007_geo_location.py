@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-17 23:21
+
+from django.db import migrations, models
+
+# Pure functions over the static gazetteer, not models, so safe to share.
+from core.geo import grid_cell, lookup_place
+
+
+def backfill_locations(apps, schema_editor):
+    # One UPDATE per distinct place rather than per row.
+    Donor = apps.get_model('core', 'Donor')
+    BloodRequest = apps.get_model('core', 'BloodRequest')
+    for city in list(Donor.objects.values_list('city', flat=True).distinct()):
+        coords = lookup_place(city)
+        if coords:
+            Donor.objects.filter(city=city).update(
+                latitude=coords[0], longitude=coords[1], grid_cell=grid_cell(*coords),
+            )
+    for location in list(BloodRequest.objects.values_list('location', flat=True).distinct()):
+        coords = lookup_place(location)
+        if coords:
+            BloodRequest.objects.filter(location=location).update(latitude=coords[0], longitude=coords[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_donor_phone_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='grid_cell',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['grid_cell'], name='donor_grid_cell_idx'),
+        ),
+        migrations.RunPython(backfill_locations, migrations.RunPython.noop),
+    ]
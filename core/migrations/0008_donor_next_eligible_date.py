@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 23:23
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F
+
+
+def backfill_next_eligible_date(apps, schema_editor):
+    Donor = apps.get_model('core', 'Donor')
+    Donor.objects.filter(last_donation_date__isnull=False).update(
+        next_eligible_date=ExpressionWrapper(
+            F('last_donation_date') + timedelta(days=90), output_field=models.DateField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_geo_location'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='donor',
+            name='donor_group_available_idx',
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='next_eligible_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_next_eligible_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['blood_group', 'is_available', 'next_eligible_date'], name='donor_group_avail_elig_idx'),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 4.2 on 2026-10-17 23:33
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_fulfilled_at(apps, schema_editor):
+    # Best available estimate for requests fulfilled before the column existed.
+    BloodRequest = apps.get_model('core', 'BloodRequest')
+    BloodRequest.objects.filter(status='FULFILLED', fulfilled_at__isnull=True).update(fulfilled_at=models.F('updated_at'))
+
+
+def backfill_rollups(apps, schema_editor):
+    # core.rollups.rebuild_range over every existing row, as of this migration.
+    Donation = apps.get_model('core', 'Donation')
+    BloodRequest = apps.get_model('core', 'BloodRequest')
+    DailyDonationStat = apps.get_model('core', 'DailyDonationStat')
+    DailyRequestStat = apps.get_model('core', 'DailyRequestStat')
+    DailyFulfilmentStat = apps.get_model('core', 'DailyFulfilmentStat')
+    donations = (
+        Donation.objects.values('donation_date', 'blood_group')
+        .annotate(donations=Count('pk'), units=Sum('units')).order_by()
+    )
+    requests = (
+        BloodRequest.objects.annotate(day=TruncDate('created_at')).values('day', 'urgency', 'status')
+        .annotate(requests=Count('pk'), units_requested=Sum('units_requested')).order_by()
+    )
+    fulfilments = (
+        BloodRequest.objects.filter(fulfilled_at__isnull=False).annotate(day=TruncDate('fulfilled_at'))
+        .values('day', 'urgency')
+        .annotate(fulfilled=Count('pk'), latency=Sum(F('fulfilled_at') - F('created_at'))).order_by()
+    )
+    DailyDonationStat.objects.bulk_create([
+        DailyDonationStat(day=row['donation_date'], blood_group=row['blood_group'],
+                          donations=row['donations'], units=row['units'])
+        for row in donations
+    ])
+    DailyRequestStat.objects.bulk_create([DailyRequestStat(**row) for row in requests])
+    DailyFulfilmentStat.objects.bulk_create([
+        DailyFulfilmentStat(
+            day=row['day'], urgency=row['urgency'], fulfilled=row['fulfilled'],
+            latency_seconds=max(round((row['latency'] or timedelta()).total_seconds()), 0),
+        )
+        for row in fulfilments
+    ])
+
+
+def clear_rollups(apps, schema_editor):
+    for name in ('DailyDonationStat', 'DailyRequestStat', 'DailyFulfilmentStat'):
+        apps.get_model('core', name).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_inventory_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDonationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3)),
+                ('donations', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyFulfilmentStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('urgency', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('CRITICAL', 'Critical')], max_length=10)),
+                ('fulfilled', models.IntegerField(default=0)),
+                ('latency_seconds', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyRequestStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('urgency', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('CRITICAL', 'Critical')], max_length=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PARTIAL', 'Partially Fulfilled'), ('FULFILLED', 'Fulfilled'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('requests', models.IntegerField(default=0)),
+                ('units_requested', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='fulfilled_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['fulfilled_at'], name='request_fulfilled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['donation_date', 'blood_group', 'units'], name='donation_date_group_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrequeststat',
+            constraint=models.UniqueConstraint(fields=('day', 'urgency', 'status'), name='request_stat_day_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyfulfilmentstat',
+            constraint=models.UniqueConstraint(fields=('day', 'urgency'), name='fulfilment_stat_day_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailydonationstat',
+            constraint=models.UniqueConstraint(fields=('day', 'blood_group'), name='donation_stat_day_group_uniq'),
+        ),
+        migrations.RunPython(backfill_fulfilled_at, migrations.RunPython.noop),
+        migrations.RunPython(backfill_rollups, clear_rollups),
+    ]
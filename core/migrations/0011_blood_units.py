@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-17 23:38
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_opening_stock(apps, schema_editor):
+    # Existing counts become individual whole-blood units collected today, so
+    # the BloodInventory projection matches the unit table from the start.
+    BloodInventory = apps.get_model('core', 'BloodInventory')
+    BloodUnit = apps.get_model('core', 'BloodUnit')
+    today = django.utils.timezone.localdate()
+    for inventory in BloodInventory.objects.filter(units_available__gt=0):
+        BloodUnit.objects.bulk_create([
+            BloodUnit(
+                blood_group=inventory.blood_group, component='WHOLE_BLOOD', collected_on=today,
+                expires_on=today + datetime.timedelta(days=35), status='AVAILABLE',
+            )
+            for _ in range(inventory.units_available)
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3)),
+                ('component', models.CharField(choices=[('WHOLE_BLOOD', 'Whole Blood'), ('RED_CELLS', 'Packed Red Cells'), ('PLATELETS', 'Platelets'), ('PLASMA', 'Fresh Frozen Plasma')], default='WHOLE_BLOOD', max_length=20)),
+                ('collected_on', models.DateField(default=django.utils.timezone.localdate)),
+                ('expires_on', models.DateField()),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Available'), ('ISSUED', 'Issued'), ('EXPIRED', 'Expired'), ('DISCARDED', 'Discarded')], default='AVAILABLE', max_length=10)),
+                ('issued_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('donation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='blood_units', to='core.donation')),
+                ('issued_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='blood_units', to='core.bloodrequest')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bloodunit',
+            index=models.Index(condition=models.Q(('status', 'AVAILABLE')), fields=['expires_on', 'blood_group', 'component'], name='unit_available_fefo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodunit',
+            index=models.Index(fields=['status', 'expires_on'], name='unit_status_expiry_idx'),
+        ),
+        migrations.RunPython(create_opening_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 00:11
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_blood_units'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='donor_name_lower_idx'),
+        ),
+    ]
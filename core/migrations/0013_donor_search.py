@@ -0,0 +1,74 @@
+# Generated by Django 4.2 on 2026-10-18 00:15
+
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def normalize_phone(phone):
+    # core.models.normalize_phone as of this migration.
+    digits = re.sub(r'\D', '', phone or '')
+    if ((phone or '').lstrip().startswith('+') or len(digits) > 10) and digits.startswith('91'):
+        digits = digits[2:]
+    return digits.lstrip('0')
+
+
+def fill_phone_normalized(apps, schema_editor):
+    Donor = apps.get_model('core', 'Donor')
+    rows = Donor.objects.using(schema_editor.connection.alias).values_list('pk', 'phone')
+    updates = [(normalize_phone(phone), pk) for pk, phone in rows.iterator(chunk_size=BATCH_SIZE)]
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, len(updates), BATCH_SIZE):
+            cursor.executemany(
+                "UPDATE core_donor SET phone_normalized = %s WHERE id = %s", updates[start:start + BATCH_SIZE],
+            )
+
+
+def create_name_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE core_donor_search USING fts5("
+            "name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute("INSERT INTO core_donor_search (rowid, name) SELECT id, name FROM core_donor")
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX donor_name_tsv_idx ON core_donor USING gin (to_tsvector('simple', name))"
+        )
+        schema_editor.execute(
+            "CREATE INDEX donor_name_trgm_idx ON core_donor USING gin (lower(name) gin_trgm_ops)"
+        )
+
+
+def drop_name_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS core_donor_search")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS donor_name_tsv_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS donor_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_donor_name_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_phone_normalized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['phone_normalized'], name='donor_phone_norm_idx'),
+        ),
+        migrations.RunPython(create_name_index, drop_name_index),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
+import re
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+from .geo import assign_location
+
 BLOOD_GROUP_CHOICES = [
     ('A+', 'A+'),
     ('A-', 'A-'),
@@ -19,6 +26,12 @@ URGENCY_CHOICES = [
     ('CRITICAL', 'Critical'),
 ]
 
+# Minimum gap between two whole-blood donations.
+DONATION_INTERVAL = timedelta(days=90)
+
+PHONE_COUNTRY_CODE = '91'
+NATIONAL_NUMBER_DIGITS = 10
+
 REQUEST_STATUS = [
     ('PENDING', 'Pending'),
     ('PARTIAL', 'Partially Fulfilled'),
@@ -26,42 +39,170 @@ REQUEST_STATUS = [
     ('CANCELLED', 'Cancelled'),
 ]
 
+COMPONENT_CHOICES = [
+    ('WHOLE_BLOOD', 'Whole Blood'),
+    ('RED_CELLS', 'Packed Red Cells'),
+    ('PLATELETS', 'Platelets'),
+    ('PLASMA', 'Fresh Frozen Plasma'),
+]
+
+# Storage life from collection, by component.
+SHELF_LIFE = {
+    'WHOLE_BLOOD': timedelta(days=35),
+    'RED_CELLS': timedelta(days=42),
+    'PLATELETS': timedelta(days=5),
+    'PLASMA': timedelta(days=365),
+}
+
+UNIT_STATUS = [
+    ('AVAILABLE', 'Available'),
+    ('ISSUED', 'Issued'),
+    ('EXPIRED', 'Expired'),
+    ('DISCARDED', 'Discarded'),
+]
+
+
+def next_eligible_date(last_donation_date):
+    if not last_donation_date:
+        return None
+    return last_donation_date + DONATION_INTERVAL
 
-class Donor(models.Model):
+
+def normalize_phone(phone):
+    """The national number as bare digits: no punctuation, country code or trunk 0."""
+    digits = re.sub(r'\D', '', phone or '')
+    international = (phone or '').lstrip().startswith('+') or len(digits) > NATIONAL_NUMBER_DIGITS
+    if international and digits.startswith(PHONE_COUNTRY_CODE):
+        digits = digits[len(PHONE_COUNTRY_CODE):]
+    return digits.lstrip('0')
+
+
+def eligible_on(day):
+    """Q for donors who may donate on `day`; matches Donor.is_eligible."""
+    return Q(next_eligible_date__isnull=True) | Q(next_eligible_date__lte=day)
+
+
+class LocatedModel:
+    """Remembers the place a row was loaded with, for assign_location()."""
+    place_field = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.place_field in field_names:
+            instance._loaded_place = getattr(instance, cls.place_field)
+        return instance
+
+
+class Donor(LocatedModel, models.Model):
     name = models.CharField(max_length=255)
     age = models.PositiveIntegerField()
     phone = models.CharField(max_length=20)
+    # normalize_phone(phone), for prefix search.
+    phone_normalized = models.CharField(max_length=20, blank=True, editable=False)
     email = models.EmailField(blank=True, null=True)
     address = models.TextField()
     city = models.CharField(max_length=100, default="")
     blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES)
     last_donation_date = models.DateField(blank=True, null=True)
+    # last_donation_date + DONATION_INTERVAL, kept in sync so eligibility can be filtered in SQL.
+    next_eligible_date = models.DateField(blank=True, null=True, editable=False)
     total_donations = models.PositiveIntegerField(default=0)
     is_available = models.BooleanField(default=True)
     reputation_points = models.PositiveIntegerField(default=0)
     badges = models.CharField(max_length=255, blank=True, help_text="Comma separated badge names")
     responsiveness_score = models.FloatField(default=0.0)
+    # Filled from the city via core.geo's gazetteer when not given explicitly,
+    # and again whenever the city changes.
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    grid_cell = models.CharField(max_length=16, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['blood_group', 'is_available', 'next_eligible_date'],
+                name='donor_group_avail_elig_idx',
+            ),
+            models.Index(fields=['city'], name='donor_city_idx'),
+            models.Index(fields=['phone'], name='donor_phone_idx'),
+            models.Index(fields=['phone_normalized'], name='donor_phone_norm_idx'),
+            # Name-prefix search where core.search has no full-text index.
+            models.Index(Lower('name'), name='donor_name_lower_idx'),
+            models.Index(fields=['grid_cell'], name='donor_grid_cell_idx'),
+            models.Index(fields=['-created_at', '-id'], name='donor_created_id_idx'),
+        ]
+
+    place_field = 'city'
+    # Computed by refresh_derived_fields() rather than entered by staff.
+    DERIVED_FIELDS = ('latitude', 'longitude', 'grid_cell', 'next_eligible_date', 'phone_normalized')
+
     def __str__(self):
         return f"{self.name} ({self.blood_group})"
 
+    def save(self, *args, **kwargs):
+        self.refresh_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *self.DERIVED_FIELDS}
+        super().save(*args, **kwargs)
+
+    def refresh_derived_fields(self):
+        # Called by save(); bulk writers call it themselves.
+        assign_location(self, self.city)
+        self.next_eligible_date = next_eligible_date(self.last_donation_date)
+        self.phone_normalized = normalize_phone(self.phone)
+
     @property
     def is_eligible(self):
-        if not self.last_donation_date:
-            return True
-        delta = timezone.now().date() - self.last_donation_date
-        return delta.days >= 90
+        return self.next_eligible_date is None or self.next_eligible_date <= timezone.now().date()
+
+
+class ChangeCounter(models.Model):
+    """Named monotonic counters, e.g. the inventory version behind ETags and delta polling."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+def bump_counter(name):
+    """Increment counter `name` and return the new value.
+
+    Run it inside the transaction making the change it versions, so the bump
+    rolls back with it.
+    """
+    with transaction.atomic():
+        counters = ChangeCounter.objects.filter(name=name)
+        if not counters.update(value=F('value') + 1):
+            ChangeCounter.objects.get_or_create(name=name)
+            counters.update(value=F('value') + 1)
+        return counters.values_list('value', flat=True).get()
+
+
+INVENTORY_COUNTER = 'inventory'
 
 
 class BloodInventory(models.Model):
     blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES, unique=True)
     units_available = models.PositiveIntegerField(default=0)
+    # Value of the inventory counter when this row last changed.
+    version = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return f"{self.blood_group}: {self.units_available} units"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.version = bump_counter(INVENTORY_COUNTER)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+            super().save(*args, **kwargs)
+
 
 class Donation(models.Model):
     donor = models.ForeignKey(Donor, on_delete=models.CASCADE, related_name='donations')
@@ -70,11 +211,19 @@ class Donation(models.Model):
     donation_date = models.DateField(default=timezone.now)
     is_urgent = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Covers the dashboard's units-per-group aggregate without touching the table.
+            models.Index(fields=['blood_group', 'units'], name='donation_group_units_idx'),
+            # Lets rebuild_rollups aggregate a date range from the index alone.
+            models.Index(fields=['donation_date', 'blood_group', 'units'], name='donation_date_group_idx'),
+        ]
+
     def __str__(self):
         return f"{self.donor.name} - {self.units} units ({self.blood_group})"
 
 
-class BloodRequest(models.Model):
+class BloodRequest(LocatedModel, models.Model):
     requester_type = models.CharField(max_length=50, default='Hospital')  # or 'Individual'
     requester_name = models.CharField(max_length=255)
     contact_phone = models.CharField(max_length=20)
@@ -86,16 +235,74 @@ class BloodRequest(models.Model):
     units_requested = models.PositiveIntegerField()
     urgency = models.CharField(max_length=10, choices=URGENCY_CHOICES, default='MEDIUM')
     location = models.CharField(max_length=255)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=REQUEST_STATUS, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    fulfilled_at = models.DateTimeField(blank=True, null=True, editable=False)
     notes = models.TextField(blank=True, null=True)
 
     donors_assigned = models.ManyToManyField(Donor, blank=True, related_name='assigned_requests')
 
+    place_field = 'location'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='request_status_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='request_created_id_idx'),
+            models.Index(fields=['fulfilled_at'], name='request_fulfilled_idx'),
+        ]
+
     def __str__(self):
         return f"Request #{self.id} - {self.blood_group} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        assign_location(self, self.location)
+        if self.status != 'FULFILLED':
+            self.fulfilled_at = None
+        elif self.fulfilled_at is None:
+            self.fulfilled_at = timezone.now()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'latitude', 'longitude', 'fulfilled_at'}
+        super().save(*args, **kwargs)
+
+
+class BloodUnit(models.Model):
+    """One bag of blood or a blood component.
+
+    BloodInventory.units_available is a projection of the AVAILABLE units per
+    group, adjusted by the allocation helpers in core.utils as units move.
+    """
+    donation = models.ForeignKey(Donation, on_delete=models.SET_NULL, blank=True, null=True, related_name='blood_units')
+    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES)
+    component = models.CharField(max_length=20, choices=COMPONENT_CHOICES, default='WHOLE_BLOOD')
+    collected_on = models.DateField(default=timezone.localdate)
+    expires_on = models.DateField()
+    status = models.CharField(max_length=10, choices=UNIT_STATUS, default='AVAILABLE')
+    issued_to = models.ForeignKey(BloodRequest, on_delete=models.SET_NULL, blank=True, null=True, related_name='blood_units')
+    issued_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # First-expiring-first-out scan over the stock that can still be issued.
+            models.Index(
+                fields=['expires_on', 'blood_group', 'component'], name='unit_available_fefo_idx',
+                condition=Q(status='AVAILABLE'),
+            ),
+            models.Index(fields=['status', 'expires_on'], name='unit_status_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_component_display()} {self.blood_group} (expires {self.expires_on})"
+
+    def save(self, *args, **kwargs):
+        if self.expires_on is None:
+            self.expires_on = self.collected_on + SHELF_LIFE[self.component]
+        super().save(*args, **kwargs)
+
 
 class NotificationLog(models.Model):
     recipient = models.CharField(max_length=255)
@@ -105,5 +312,95 @@ class NotificationLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='SENT')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='notiflog_created_idx'),
+            models.Index(fields=['channel', '-created_at'], name='notiflog_channel_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='notiflog_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.recipient} via {self.channel} at {self.created_at}"
+
+
+OUTBOX_STATUS = [
+    ('PENDING', 'Pending'),
+    ('SENDING', 'Sending'),
+    ('SENT', 'Sent'),
+    ('FAILED', 'Failed'),
+]
+
+
+class OutboxMessage(models.Model):
+    channel = models.CharField(max_length=20)  # email / sms
+    recipient = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255, blank=True)
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    # When the message is next due; while SENDING it is the worker's lease expiry.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+
+# Daily rollups, kept current on write by core.rollups and rebuilt from history
+# by the rebuild_rollups command. Counters are signed so a late correction can
+# never trip a constraint.
+
+class DailyDonationStat(models.Model):
+    day = models.DateField()
+    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES)
+    donations = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'blood_group'], name='donation_stat_day_group_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.blood_group}: {self.units} units"
+
+
+class DailyRequestStat(models.Model):
+    # Requests bucketed by the day they were created, under their current urgency and status.
+    day = models.DateField()
+    urgency = models.CharField(max_length=10, choices=URGENCY_CHOICES)
+    status = models.CharField(max_length=20, choices=REQUEST_STATUS)
+    requests = models.IntegerField(default=0)
+    units_requested = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'urgency', 'status'], name='request_stat_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.urgency}/{self.status}: {self.requests}"
+
+
+class DailyFulfilmentStat(models.Model):
+    # Requests bucketed by the day they were fulfilled; mean latency is latency_seconds / fulfilled.
+    day = models.DateField()
+    urgency = models.CharField(max_length=10, choices=URGENCY_CHOICES)
+    fulfilled = models.IntegerField(default=0)
+    latency_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'urgency'], name='fulfilment_stat_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.urgency}: {self.fulfilled} fulfilled"
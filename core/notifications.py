@@ -1,31 +1,175 @@
-from django.core.mail import send_mail
+import uuid
+from datetime import timedelta
+
+from django.core.mail import get_connection, EmailMessage
 from django.conf import settings
-from .models import NotificationLog
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import NotificationLog, OutboxMessage
 
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+# A worker that dies mid-batch leaves rows SENDING; they are picked up again once this lease expires.
+SENDING_LEASE = timedelta(minutes=5)
+LOG_BATCH_SIZE = 500
 
-def log_notification(recipient, channel, subject, message, status='SENT'):
-    NotificationLog.objects.create(
-        recipient=recipient,
-        channel=channel,
-        subject=subject,
-        message=message,
-        status=status,
-    )
 
+# --- Outbox -----------------------------------------------------------------
+# Views queue notifications inside their own transaction; the process_outbox
+# worker delivers them, so request latency no longer depends on SMTP or SMS.
 
-def send_email_notification(to_email, subject, message):
+def email_outbox_message(to_email, subject, message):
     if not to_email:
-        return
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [to_email],
-        fail_silently=True,
+        return None
+    return OutboxMessage(channel='email', recipient=to_email, subject=subject, message=message)
+
+
+def sms_outbox_message(phone_number, message):
+    if not phone_number:
+        return None
+    return OutboxMessage(channel='sms', recipient=phone_number, subject="SMS Notification", message=message)
+
+
+def queue_notifications(messages):
+    messages = [m for m in messages if m is not None]
+    if messages:
+        OutboxMessage.objects.bulk_create(messages)
+    return len(messages)
+
+
+def queue_email_notification(to_email, subject, message):
+    return queue_notifications([email_outbox_message(to_email, subject, message)])
+
+
+def queue_sms_notification(phone_number, message):
+    return queue_notifications([sms_outbox_message(phone_number, message)])
+
+
+class BaseSMSBackend:
+    """Gateway interface: send one SMS, raising on failure."""
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, phone_number, message):
+        raise NotImplementedError
+
+
+class ConsoleSMSBackend(BaseSMSBackend):
+    # Local stub; prints instead of contacting a gateway.
+    def send(self, phone_number, message):
+        print(f"SMS to {phone_number}: {message}")
+
+
+class LocMemSMSBackend(BaseSMSBackend):
+    outbox = []
+
+    def send(self, phone_number, message):
+        self.outbox.append((phone_number, message))
+
+
+def get_sms_backend():
+    path = getattr(settings, 'SMS_BACKEND', 'core.notifications.ConsoleSMSBackend')
+    return import_string(path)()
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def claim_outbox_batch(batch_size=100):
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = (
+        OutboxMessage.objects.filter(Q(status='PENDING') | Q(status='SENDING'), next_attempt_at__lte=now)
+        .order_by('next_attempt_at')
+        .values('pk')[:batch_size]
     )
-    log_notification(recipient=to_email, channel='email', subject=subject, message=message)
+    if connection.features.has_select_for_update_skip_locked:
+        # Several workers drain the queue without waiting on each other's rows.
+        due = due.select_for_update(skip_locked=True)
+    with transaction.atomic():
+        # One UPDATE ... WHERE id IN (SELECT ...), so a row is claimed by one worker only.
+        OutboxMessage.objects.filter(pk__in=due).update(
+            status='SENDING', next_attempt_at=now + SENDING_LEASE, claim_token=token,
+        )
+    return list(OutboxMessage.objects.filter(claim_token=token, status='SENDING'))
+
+
+def deliver_outbox_batch(batch):
+    """Send a claimed batch over one email connection and one SMS session."""
+    emails = [m for m in batch if m.channel == 'email']
+    texts = [m for m in batch if m.channel == 'sms']
+    results = {}
+
+    if emails:
+        connection = get_connection()
+        try:
+            connection.open()
+            for m in emails:
+                email = EmailMessage(m.subject, m.message, settings.DEFAULT_FROM_EMAIL, [m.recipient],
+                                     connection=connection)
+                results[m.pk] = _attempt(connection.send_messages, [email])
+        except Exception as exc:  # noqa: BLE001 - connection failures retry the whole batch
+            for m in emails:
+                results.setdefault(m.pk, str(exc) or exc.__class__.__name__)
+        finally:
+            connection.close()
+
+    if texts:
+        backend = get_sms_backend()
+        try:
+            backend.open()
+            for m in texts:
+                results[m.pk] = _attempt(backend.send, m.recipient, m.message)
+        except Exception as exc:  # noqa: BLE001
+            for m in texts:
+                results.setdefault(m.pk, str(exc) or exc.__class__.__name__)
+        finally:
+            backend.close()
+
+    for m in batch:
+        if m.channel not in ('email', 'sms'):
+            results[m.pk] = f"Unknown channel {m.channel!r}"
+    return _record_results(batch, results)
+
+
+def _attempt(func, *args):
+    try:
+        func(*args)
+    except Exception as exc:  # noqa: BLE001
+        return str(exc) or exc.__class__.__name__
+    return None
+
 
+def _record_results(batch, results):
+    now = timezone.now()
+    logs = []
+    for m in batch:
+        error = results.get(m.pk)
+        m.attempts += 1
+        if error is None:
+            m.status, m.sent_at, m.last_error = 'SENT', now, ''
+        elif m.attempts >= MAX_ATTEMPTS:
+            m.status, m.last_error = 'FAILED', error
+        else:
+            m.status, m.last_error = 'PENDING', error
+            m.next_attempt_at = now + retry_delay(m.attempts)
+        if m.status != 'PENDING':
+            logs.append(NotificationLog(
+                recipient=m.recipient, channel=m.channel, subject=m.subject,
+                message=m.message, status=m.status,
+            ))
 
-def send_sms_notification(phone_number, message):
-    subject = "SMS Notification"
-    log_notification(recipient=phone_number, channel='sms', subject=subject, message=message)
+    with transaction.atomic():
+        OutboxMessage.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+        )
+        NotificationLog.objects.bulk_create(logs, batch_size=LOG_BATCH_SIZE)
+    return sum(1 for m in batch if m.status == 'SENT')
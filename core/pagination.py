@@ -0,0 +1,102 @@
+import base64
+from itertools import islice
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.dateparse import parse_datetime
+
+PER_PAGE = 50
+STREAM_CHUNK_SIZE = 500
+ROWS_MARKER = '<!-- stream-rows -->'
+
+
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, UnicodeError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, params):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self._params = params
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def next_query(self):
+        params = self._params.copy()
+        params['cursor'] = self.next_cursor
+        return params.urlencode()
+
+    def first_query(self):
+        params = self._params.copy()
+        params.pop('cursor', None)
+        return params.urlencode()
+
+
+def keyset_order(queryset, descending=True):
+    if descending:
+        return queryset.order_by('-created_at', '-id')
+    return queryset.order_by('created_at', 'id')
+
+
+def keyset_paginate(queryset, params, per_page=PER_PAGE, descending=True):
+    """Page through queryset on (created_at, id) using the `cursor` GET parameter.
+
+    Unlike OFFSET pagination this stays an index range scan however deep the
+    page, and rows inserted meanwhile don't shift later pages.
+    """
+    queryset = keyset_order(queryset, descending)
+    position = decode_cursor(params.get('cursor', ''))
+    if position:
+        created_at, pk = position
+        if descending:
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        else:
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+    object_list = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(object_list) > per_page:
+        object_list = object_list[:per_page]
+        next_cursor = encode_cursor(object_list[-1])
+    return KeysetPage(object_list, next_cursor, params)
+
+
+def stream_table(request, template_name, context, rows_template, rows_name, queryset,
+                 chunk_size=STREAM_CHUNK_SIZE):
+    """Stream a list page, rendering table rows chunk by chunk from queryset.iterator().
+
+    template_name is rendered once with `streaming` set and must output
+    ROWS_MARKER where the rows go; rows_template renders one chunk of rows.
+    """
+    page = render_to_string(template_name, {**context, 'streaming': True, 'rows_marker': ROWS_MARKER}, request)
+    head, tail = page.split(ROWS_MARKER, 1)
+    rows = get_template(rows_template)
+
+    def generate():
+        yield head
+        iterator = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            yield rows.render({rows_name: chunk})
+        yield tail
+
+    return StreamingHttpResponse(generate(), content_type='text/html; charset=utf-8')
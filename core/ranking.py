@@ -0,0 +1,123 @@
+"""Cached donor rankings for the request pages.
+
+A ranking is cached under the request id, the request's last change, today's
+date and the donor-pool version, which every Donor or Donation change bumps
+(bulk writers call bump_donor_pool() once themselves). Nothing is deleted on
+a change: old keys are simply never read again and leave the 'rankings'
+cache through its LRU culling or timeout.
+
+The version lives in the 'rankings' cache rather than a database row every
+write would lock, so it is shared between processes when that cache is.
+
+Concurrent misses for one key compute the ranking once. Threads in a process
+wait on the first caller; other processes wait on a lock entry in the cache,
+which only spans processes when that cache is shared (Redis).
+"""
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .utils import prioritize_donors_for_request
+
+RANKING_CACHE = 'rankings'
+POOL_VERSION_KEY = 'core:donor-pool:version'
+# How long a process waits on another's computation before doing its own.
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+
+def _start_version(rankings):
+    # A version lost to eviction restarts from the clock, past any an old key carries.
+    rankings.add(POOL_VERSION_KEY, time.time_ns(), None)
+    return rankings.get(POOL_VERSION_KEY)
+
+
+def donor_pool_version():
+    rankings = caches[RANKING_CACHE]
+    version = rankings.get(POOL_VERSION_KEY)
+    return _start_version(rankings) if version is None else version
+
+
+def _incr_version():
+    rankings = caches[RANKING_CACHE]
+    try:
+        rankings.incr(POOL_VERSION_KEY)
+    except ValueError:
+        _start_version(rankings)
+
+
+def bump_donor_pool():
+    # After commit, so a rolled-back change keeps the old version.
+    transaction.on_commit(_incr_version)
+
+
+def ranking_key(blood_request, today, version):
+    changed = blood_request.updated_at.timestamp() if blood_request.updated_at else 0
+    return f"core:ranking:{blood_request.pk}:{changed}:{today.isoformat()}:{version}"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.ok = False
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key, compute):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        # If the leader failed, each waiter tries for itself.
+        return flight.value if flight.ok else compute()
+    try:
+        flight.value = compute()
+        flight.ok = True
+        return flight.value
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _compute_once(rankings, key, compute):
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    locked = rankings.add(lock_key, 1, LOCK_TIMEOUT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = rankings.get(key)
+        if value is not None:
+            return value
+        locked = rankings.add(lock_key, 1, LOCK_TIMEOUT)
+    try:
+        value = rankings.get(key) if locked else None
+        if value is None:
+            value = compute()
+            rankings.set(key, value)
+        return value
+    finally:
+        if locked:
+            rankings.delete(lock_key)
+
+
+def ranked_donors(blood_request, today=None):
+    """prioritize_donors_for_request(blood_request), cached."""
+    rankings = caches[RANKING_CACHE]
+    key = ranking_key(blood_request, today or timezone.now().date(), donor_pool_version())
+    donors = rankings.get(key)
+    if donors is None:
+        donors = _single_flight(
+            key, lambda: _compute_once(rankings, key, lambda: prioritize_donors_for_request(blood_request)),
+        )
+    return donors
@@ -0,0 +1,181 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Donation,
+    BloodRequest,
+    DailyDonationStat,
+    DailyRequestStat,
+    DailyFulfilmentStat,
+)
+
+# Fields each rollup reads; saves that touch none of them skip the bookkeeping.
+ROLLUP_FIELDS = {
+    Donation: ('donation_date', 'blood_group', 'units'),
+    BloodRequest: ('created_at', 'urgency', 'status', 'units_requested', 'fulfilled_at'),
+}
+
+
+def bump(model, keys, **deltas):
+    rows = model.objects.filter(**keys)
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if not rows.update(**changes):
+        # The first change of a day: add the row, unless a concurrent save just did,
+        # without get_or_create's lookup and savepoint.
+        model.objects.bulk_create([model(**keys)], ignore_conflicts=True)
+        rows.update(**changes)
+
+
+def _day(value):
+    # Requests are stamped with datetimes; bucket them by local calendar day.
+    return timezone.localdate(value) if isinstance(value, datetime) else value
+
+
+def apply_donation(values, sign):
+    bump(
+        DailyDonationStat,
+        {'day': _day(values['donation_date']), 'blood_group': values['blood_group']},
+        donations=sign, units=sign * values['units'],
+    )
+
+
+def apply_request(values, sign):
+    bump(
+        DailyRequestStat,
+        {'day': _day(values['created_at']), 'urgency': values['urgency'], 'status': values['status']},
+        requests=sign, units_requested=sign * values['units_requested'],
+    )
+    if values['fulfilled_at'] is not None:
+        latency = max(round((values['fulfilled_at'] - values['created_at']).total_seconds()), 0)
+        bump(
+            DailyFulfilmentStat,
+            {'day': _day(values['fulfilled_at']), 'urgency': values['urgency']},
+            fulfilled=sign, latency_seconds=sign * latency,
+        )
+
+
+APPLY = {Donation: apply_donation, BloodRequest: apply_request}
+
+
+def tracked_values(instance):
+    return {field: getattr(instance, field) for field in ROLLUP_FIELDS[type(instance)]}
+
+
+# Marks a save that cannot have changed any rollup.
+UNCHANGED = object()
+
+
+def stored_values(instance, update_fields=None):
+    """The row's rollup fields as stored before this save: None for a new row."""
+    fields = ROLLUP_FIELDS[type(instance)]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return UNCHANGED
+    if instance._state.adding:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def record_save(instance, previous):
+    if previous is UNCHANGED:
+        return
+    current = tracked_values(instance)
+    if previous == current:
+        return
+    apply = APPLY[type(instance)]
+    if previous is not None:
+        apply(previous, -1)
+    apply(current, 1)
+
+
+def record_delete(instance):
+    APPLY[type(instance)](tracked_values(instance), -1)
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_range(start, end):
+    """Recompute every rollup row for days in [start, end) from the raw tables."""
+    start_at, end_at = _local_midnight(start), _local_midnight(end)
+    donations = (
+        Donation.objects.filter(donation_date__gte=start, donation_date__lt=end)
+        .values('donation_date', 'blood_group')
+        .annotate(donations=Count('pk'), units=Sum('units'))
+        .order_by()
+    )
+    requests = (
+        BloodRequest.objects.filter(created_at__gte=start_at, created_at__lt=end_at)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'urgency', 'status')
+        .annotate(requests=Count('pk'), units_requested=Sum('units_requested'))
+        .order_by()
+    )
+    fulfilments = (
+        BloodRequest.objects.filter(fulfilled_at__gte=start_at, fulfilled_at__lt=end_at)
+        .annotate(day=TruncDate('fulfilled_at'))
+        .values('day', 'urgency')
+        .annotate(fulfilled=Count('pk'), latency=Sum(F('fulfilled_at') - F('created_at')))
+        .order_by()
+    )
+    with transaction.atomic():
+        for model in (DailyDonationStat, DailyRequestStat, DailyFulfilmentStat):
+            model.objects.filter(day__gte=start, day__lt=end).delete()
+        DailyDonationStat.objects.bulk_create([
+            DailyDonationStat(day=row['donation_date'], blood_group=row['blood_group'],
+                              donations=row['donations'], units=row['units'])
+            for row in donations
+        ])
+        DailyRequestStat.objects.bulk_create([DailyRequestStat(**row) for row in requests])
+        DailyFulfilmentStat.objects.bulk_create([
+            DailyFulfilmentStat(
+                day=row['day'], urgency=row['urgency'], fulfilled=row['fulfilled'],
+                latency_seconds=max(round((row['latency'] or timedelta()).total_seconds()), 0),
+            )
+            for row in fulfilments
+        ])
+
+
+def daily_report(since, until):
+    """Per-day totals and breakdowns for [since, until], read only from the rollup tables."""
+    donations = DailyDonationStat.objects.filter(day__range=(since, until))
+    requests = DailyRequestStat.objects.filter(day__range=(since, until))
+    fulfilments = DailyFulfilmentStat.objects.filter(day__range=(since, until))
+
+    days = {}
+    for offset in range((until - since).days + 1):
+        day = since + timedelta(days=offset)
+        days[day] = {'day': day, 'units': 0, 'donations': 0, 'requests': 0, 'fulfilled': 0, 'latency_seconds': 0}
+    for row in donations.values('day').annotate(units_sum=Sum('units'), donations_sum=Sum('donations')):
+        days[row['day']].update(units=row['units_sum'], donations=row['donations_sum'])
+    for row in requests.values('day').annotate(requests_sum=Sum('requests')):
+        days[row['day']]['requests'] = row['requests_sum']
+    for row in fulfilments.values('day').annotate(fulfilled_sum=Sum('fulfilled'), latency_sum=Sum('latency_seconds')):
+        days[row['day']].update(fulfilled=row['fulfilled_sum'], latency_seconds=row['latency_sum'])
+    for row in days.values():
+        row['mean_latency_hours'] = row['latency_seconds'] / row['fulfilled'] / 3600 if row['fulfilled'] else None
+
+    latency_by_urgency = {
+        row['urgency']: row['latency'] / row['fulfilled'] / 3600
+        for row in fulfilments.values('urgency').annotate(fulfilled=Sum('fulfilled'), latency=Sum('latency_seconds'))
+        if row['fulfilled']
+    }
+    by_urgency = {}
+    for row in requests.values('urgency', 'status').annotate(total=Sum('requests')).order_by('urgency', 'status'):
+        entry = by_urgency.setdefault(row['urgency'], {
+            'urgency': row['urgency'],
+            'statuses': [],
+            'mean_latency_hours': latency_by_urgency.get(row['urgency']),
+        })
+        entry['statuses'].append({'status': row['status'], 'requests': row['total']})
+    return {
+        'days': list(days.values()),
+        'units_by_group': list(
+            donations.values('blood_group').annotate(units=Sum('units')).order_by('blood_group')
+        ),
+        'requests_by_urgency': list(by_urgency.values()),
+    }
@@ -0,0 +1,169 @@
+"""Donor lookup by name or phone number for the front desk.
+
+A term made of digits (with optional +, spaces and punctuation) is matched
+as a prefix of Donor.phone_normalized, through donor_phone_norm_idx. Any
+other term matches donors whose name has a word starting with each word of
+the term, through the full-text index migration 0013 builds:
+
+- SQLite: the FTS5 table core_donor_search, ranked by bm25. It is a copy
+  of the names, so Donor saves and deletes update it (core.signals), and
+  bulk writers call index_donors() themselves.
+- PostgreSQL: GIN indexes on to_tsvector('simple', name) and on lower(name)
+  trigrams, which the database keeps current. The trigram match also finds
+  names with a typo in them, and ranking is ts_rank plus trigram similarity.
+
+Other backends fall back to a prefix of the whole name on donor_name_lower_idx.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+
+from .models import Donor, normalize_phone
+
+SEARCH_TABLE = 'core_donor_search'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Fewer digits than this match too many phone numbers to be useful.
+MIN_PHONE_DIGITS = 3
+RANK_WINDOW = 500
+PHONE_TERM = re.compile(r'\+?[\d\s().-]*\d[\d\s().-]*')
+RESULT_FIELDS = ('name', 'phone', 'blood_group', 'city', 'is_available', 'next_eligible_date')
+
+
+def prefix_range(expression, prefix):
+    # expression >= prefix AND expression < prefix with its last character
+    # incremented: an index range scan rather than a LIKE over every row.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{expression}__gte': prefix, f'{expression}__lt': upper})
+
+
+def phone_prefix(term):
+    """The normalized phone prefix `term` stands for, or None if it isn't a phone number."""
+    if not PHONE_TERM.fullmatch(term.strip()):
+        return None
+    digits = normalize_phone(term)
+    return digits if len(digits) >= MIN_PHONE_DIGITS else None
+
+
+def name_words(term):
+    return re.findall(r'\w+', term.lower())
+
+
+def _name_matches(connection, words, blood_group=None, window=None):
+    """(sql, params) selecting `id` and `score` (lower is better) of donors whose name matches every word.
+
+    With a window, only the newest `window` matches are selected and scored.
+    """
+    if connection.vendor == 'sqlite':
+        # Every word as a quoted prefix token; \w+ words contain no quotes.
+        params = [' '.join(f'"{word}"*' for word in words)]
+        sql = f"SELECT {SEARCH_TABLE}.rowid AS id, {SEARCH_TABLE}.rank AS score FROM {SEARCH_TABLE}"
+        if blood_group:
+            sql += f" JOIN core_donor ON core_donor.id = {SEARCH_TABLE}.rowid"
+        sql += f" WHERE {SEARCH_TABLE} MATCH %s"
+        newest = f"{SEARCH_TABLE}.rowid DESC"
+    elif connection.vendor == 'postgresql':
+        query = ' & '.join(f'{word}:*' for word in words)
+        text = ' '.join(words)
+        params = [query, text, query, text]
+        sql = (
+            "SELECT core_donor.id, -(ts_rank(to_tsvector('simple', name), to_tsquery('simple', %s)) "
+            "+ similarity(lower(name), %s)) AS score FROM core_donor "
+            "WHERE (to_tsvector('simple', name) @@ to_tsquery('simple', %s) OR lower(name) %% %s)"
+        )
+        newest = "core_donor.id DESC"
+    else:
+        return None
+    if blood_group:
+        sql += " AND core_donor.blood_group = %s"
+        params.append(blood_group)
+    if window:
+        sql += f" ORDER BY {newest} LIMIT {int(window)}"
+    return sql, params
+
+
+def filter_donors(queryset, term):
+    """`queryset` narrowed to the donors matching `term`, unranked; for the admin's search box."""
+    digits = phone_prefix(term)
+    if digits:
+        return queryset.filter(prefix_range('phone_normalized', digits))
+    words = name_words(term)
+    if not words:
+        return queryset.none()
+    matches = _name_matches(connections[queryset.db], words)
+    if matches is None:
+        return queryset.alias(name_lower=Lower('name')).filter(prefix_range('name_lower', ' '.join(words)))
+    sql, params = matches
+    return queryset.filter(pk__in=RawSQL(f"SELECT id FROM ({sql}) matches", params))
+
+
+def search_donors(term, limit=DEFAULT_LIMIT, blood_group=None):
+    """Up to `limit` donors matching `term`, best first.
+
+    Phone matches are ordered by number, so an exact match comes first.
+    Name matches are ordered by relevance, but only the newest RANK_WINDOW
+    are scored: scoring every match of a common name costs far more than
+    finding them.
+    """
+    limit = min(limit, MAX_LIMIT)
+    donors = Donor.objects.only(*RESULT_FIELDS)
+    if blood_group:
+        donors = donors.filter(blood_group=blood_group)
+    digits = phone_prefix(term)
+    if digits:
+        return list(donors.filter(prefix_range('phone_normalized', digits)).order_by('phone_normalized', '-pk')[:limit])
+    words = name_words(term)
+    if not words:
+        return []
+    connection = connections[donors.db]
+    matches = _name_matches(connection, words, blood_group, window=RANK_WINDOW)
+    if matches is None:
+        name = ' '.join(words)
+        return list(
+            donors.alias(name_lower=Lower('name')).filter(prefix_range('name_lower', name))
+            .order_by('name_lower', '-pk')[:limit]
+        )
+    sql, params = matches
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT id FROM ({sql}) matches ORDER BY score, id DESC LIMIT %s", [*params, limit])
+        ids = [row[0] for row in cursor.fetchall()]
+    found = donors.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def _search_connection():
+    connection = connections[router.db_for_write(Donor)]
+    return connection if connection.vendor == 'sqlite' else None
+
+
+def index_donors(donors):
+    """Add or refresh `donors` in the SQLite name index; other backends index names themselves."""
+    connection = _search_connection()
+    rows = [(donor.pk, donor.name) for donor in donors]
+    if connection is None or not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, name) VALUES (%s, %s)", rows)
+
+
+def unindex_donors(pks):
+    connection = _search_connection()
+    rows = [(pk,) for pk in pks]
+    if connection is None or not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", rows)
+
+
+def rebuild_index():
+    """Refill the SQLite name index from the donor table; returns the rows indexed, or None elsewhere."""
+    connection = _search_connection()
+    if connection is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, name) SELECT id, name FROM core_donor")
+        return cursor.rowcount
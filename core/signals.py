@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import rollups
+from .dashboard import invalidate_dashboard_snapshot
+from .events import publish_inventory, publish_request, request_event_data
+from .models import Donor, Donation, BloodRequest, BloodInventory
+from .ranking import bump_donor_pool
+from .search import index_donors, unindex_donors
+from .utils import inventory_changed, invalidate_inventory_version
+
+
+@receiver(post_save, sender=Donor)
+@receiver(post_delete, sender=Donor)
+@receiver(post_save, sender=Donation)
+@receiver(post_delete, sender=Donation)
+@receiver(post_save, sender=BloodRequest)
+@receiver(post_delete, sender=BloodRequest)
+@receiver(post_save, sender=BloodInventory)
+@receiver(post_delete, sender=BloodInventory)
+@receiver(inventory_changed)
+def refresh_dashboard(sender, **kwargs):
+    invalidate_dashboard_snapshot()
+
+
+@receiver(post_save, sender=BloodInventory)
+@receiver(post_delete, sender=BloodInventory)
+@receiver(inventory_changed)
+def refresh_inventory_version(sender, **kwargs):
+    invalidate_inventory_version()
+
+
+@receiver(post_save, sender=Donor)
+@receiver(post_delete, sender=Donor)
+@receiver(post_save, sender=Donation)
+@receiver(post_delete, sender=Donation)
+def refresh_donor_rankings(sender, **kwargs):
+    bump_donor_pool()
+
+
+# In the same transaction as the row, so the search index rolls back with it.
+@receiver(post_save, sender=Donor)
+def index_donor(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'name' in update_fields:
+        index_donors([instance])
+
+
+@receiver(post_delete, sender=Donor)
+def unindex_donor(sender, instance, **kwargs):
+    unindex_donors([instance.pk])
+
+
+# Live events go out after commit, so subscribers never see a rolled-back change.
+@receiver(post_save, sender=BloodInventory)
+def publish_inventory_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: publish_inventory([instance.blood_group]))
+
+
+@receiver(inventory_changed)
+def publish_inventory_change(sender, blood_groups, **kwargs):
+    transaction.on_commit(lambda: publish_inventory(blood_groups))
+
+
+@receiver(post_save, sender=BloodRequest)
+def publish_request_save(sender, instance, created, update_fields=None, **kwargs):
+    # Registered ahead of update_rollups, which pops the values stored before the save.
+    previous = instance.__dict__.get('_rollup_previous')
+    if previous is rollups.UNCHANGED or (update_fields is not None and 'status' not in update_fields):
+        previous_status = instance.status
+    else:
+        previous_status = previous['status'] if previous else None
+    data = request_event_data(instance, created, previous_status)
+    transaction.on_commit(lambda: publish_request(data))
+
+
+# Rollups change in the same transaction as the row, so they roll back with it.
+@receiver(pre_save, sender=Donation)
+@receiver(pre_save, sender=BloodRequest)
+def remember_rollup_values(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_previous = rollups.stored_values(instance, update_fields)
+
+
+@receiver(post_save, sender=Donation)
+@receiver(post_save, sender=BloodRequest)
+def update_rollups(sender, instance, **kwargs):
+    rollups.record_save(instance, instance.__dict__.pop('_rollup_previous', None))
+
+
+@receiver(post_delete, sender=Donation)
+@receiver(post_delete, sender=BloodRequest)
+def remove_from_rollups(sender, instance, **kwargs):
+    rollups.record_delete(instance)
@@ -0,0 +1,63 @@
+"""Query-budget assertions for tests and benchmark runs."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# Most queries each view may run with a cold cache, including the session and user lookups.
+QUERY_BUDGETS = {
+    'core:dashboard': 8,
+    'core:donor_list': 4,
+    'core:request_list': 4,
+    'core:request_detail': 8,
+    'core:patient_qr': 4,
+    'core:assign_donors': 28,
+    'core:inventory': 4,
+    'core:inventory_api': 4,
+    'core:reports': 8,
+    'core:crossmatch_api': 0,
+    'core:donor_search_api': 4,
+}
+
+# Most queries each admin changelist may run with a cold cache, for a
+# superuser: session, user, capped count, estimate, page, and one per
+# CommonValuesFilter.
+ADMIN_QUERY_BUDGETS = {
+    'core.donor': 6,
+    'core.bloodunit': 5,
+    'core.bloodrequest': 5,
+    'core.donation': 5,
+    'core.notificationlog': 7,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _format_queries(queries):
+    return '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(queries, start=1))
+
+
+@contextmanager
+def assert_max_queries(budget, using=DEFAULT_DB_ALIAS, label="Block"):
+    """Fail if the block runs more than `budget` queries; the message lists them all."""
+    with CaptureQueriesContext(connections[using]) as captured:
+        yield captured
+    if len(captured) > budget:
+        raise QueryBudgetExceeded(
+            f"{label} ran {len(captured)} queries, budget is {budget}:\n{_format_queries(captured.captured_queries)}"
+        )
+
+
+def assert_view_query_budget(client, url_name, *args, budget=None, method='get', data=None, **kwargs):
+    """Request a view through `client` and check it against `budget` or QUERY_BUDGETS[url_name]."""
+    if budget is None:
+        budget = QUERY_BUDGETS[url_name]
+    url = reverse(url_name, args=args, kwargs=kwargs or None)
+    with assert_max_queries(budget, label=url_name):
+        response = getattr(client, method)(url, data or {})
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return response
@@ -14,6 +14,7 @@ urlpatterns = [
     path('donors/<int:pk>/delete/', views.donor_delete, name='donor_delete'),
 
     path('inventory/', views.inventory_view, name='inventory'),
+    path('reports/', views.reports, name='reports'),
 
     path('donations/add/', views.donation_create, name='donation_create'),
 
@@ -26,4 +27,10 @@ urlpatterns = [
     path('qr/donor/', views.donor_qr_view, name='donor_qr'),
     
     path('api/crossmatch/', views.crossmatch_api, name='crossmatch_api'),
+    path('api/crossmatch/batch/', views.crossmatch_batch_api, name='crossmatch_batch_api'),
+    path('api/inventory/', views.inventory_api, name='inventory_api'),
+    path('api/allocation/', views.allocation_api, name='allocation_api'),
+    path('api/donors/search/', views.donor_search_api, name='donor_search_api'),
+    path('exports/<slug:dataset>/', views.export, name='export'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
@@ -1,67 +1,314 @@
+import heapq
+import json
+from collections import Counter
+from datetime import datetime
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.dispatch import Signal
 from django.utils import timezone
-from .models import Donor, BloodRequest, BloodInventory, BLOOD_GROUP_CHOICES
+from .geo import haversine_km
+from .models import (
+    Donor,
+    BloodRequest,
+    BloodInventory,
+    BloodUnit,
+    ChangeCounter,
+    BLOOD_GROUP_CHOICES,
+    INVENTORY_COUNTER,
+    SHELF_LIFE,
+    bump_counter,
+    eligible_on,
+)
+
+# Sent after inventory counts change through queryset updates, which bypass
+# post_save. Receivers get `blood_groups`, the groups that changed, and the
+# new inventory `version`.
+inventory_changed = Signal()
+
+INVENTORY_VERSION_KEY = 'core:inventory:version'
+# Invalidation happens on commit; the timeout bounds the window in which a
+# reader racing that commit can re-cache an older version.
+INVENTORY_VERSION_TIMEOUT = 10
 
 
 def get_or_create_inventory():
-    for bg, _ in BLOOD_GROUP_CHOICES:
-        BloodInventory.objects.get_or_create(blood_group=bg)
+    existing = set(BloodInventory.objects.values_list('blood_group', flat=True))
+    missing = [BloodInventory(blood_group=bg) for bg, _ in BLOOD_GROUP_CHOICES if bg not in existing]
+    if missing:
+        BloodInventory.objects.bulk_create(missing, ignore_conflicts=True)
     return BloodInventory.objects.all()
 
 
-def update_inventory_on_donation(donation):
-    inv, _ = BloodInventory.objects.get_or_create(blood_group=donation.blood_group)
-    inv.units_available += donation.units
-    inv.save()
+def adjust_inventory(deltas):
+    """Apply signed per-group changes to the BloodInventory projection, e.g. {'O+': 2, 'A-': -1}."""
+    deltas = {blood_group: units for blood_group, units in deltas.items() if units}
+    if not deltas:
+        return
+    with transaction.atomic():
+        version = bump_counter(INVENTORY_COUNTER)
+        # Fixed order keeps concurrent multi-group changes from deadlocking.
+        for blood_group in sorted(deltas):
+            rows = BloodInventory.objects.filter(blood_group=blood_group)
+            # Clamped so drift from manual edits can't push the count below zero.
+            changes = {
+                'units_available': Greatest(F('units_available') + deltas[blood_group], Value(0)),
+                'version': version,
+            }
+            if not rows.update(**changes):
+                BloodInventory.objects.get_or_create(blood_group=blood_group)
+                rows.update(**changes)
+    inventory_changed.send(sender=BloodInventory, blood_groups=sorted(deltas), version=version)
 
 
-def update_inventory_on_issue(blood_group, units):
-    inv, _ = BloodInventory.objects.get_or_create(blood_group=blood_group)
-    if inv.units_available >= units:
-        inv.units_available -= units
-        inv.save()
-        return True
-    return False
+def add_inventory_units(blood_group, units):
+    adjust_inventory({blood_group: units})
 
 
-def calculate_donor_score(donor: Donor, request: BloodRequest) -> float:
+def receive_donation_units(donation, component='WHOLE_BLOOD'):
+    """Create one BloodUnit per donated unit and add the usable ones to the inventory."""
+    collected_on = donation.donation_date
+    if isinstance(collected_on, datetime):
+        collected_on = timezone.localdate(collected_on)
+    expires_on = collected_on + SHELF_LIFE[component]
+    status = 'AVAILABLE' if expires_on >= timezone.localdate() else 'EXPIRED'
+    units = BloodUnit.objects.bulk_create([
+        BloodUnit(
+            donation=donation, blood_group=donation.blood_group, component=component,
+            collected_on=collected_on, expires_on=expires_on, status=status,
+        )
+        for _ in range(donation.units)
+    ])
+    if status == 'AVAILABLE':
+        adjust_inventory({donation.blood_group: len(units)})
+    return units
+
+
+# Retries when another issue claimed some of the chosen units first.
+ALLOCATION_ATTEMPTS = 3
+
+
+def allocate_units(patient_group, units, blood_request=None, component=None, donor_groups=None):
+    """Issue `units` bags for a patient, first-expiring-first-out across compatible groups.
+
+    `donor_groups` narrows the choice to some of the compatible groups. Returns
+    the issued unit ids, or [] (issuing nothing) if there is not enough
+    unexpired stock. Where the database supports it, units locked by a
+    concurrent issue are skipped instead of waited on.
+    """
+    if units < 1:
+        raise ValueError(f"units must be at least 1, not {units}")
+    today = timezone.localdate()
+    groups = compatible_donor_groups(patient_group)
+    if donor_groups is not None:
+        groups = [group for group in groups if group in donor_groups]
+    available = BloodUnit.objects.filter(status='AVAILABLE', expires_on__gte=today, blood_group__in=groups)
+    if component:
+        available = available.filter(component=component)
+    available = available.order_by('expires_on', 'id')
+
+    for _ in range(ALLOCATION_ATTEMPTS):
+        with transaction.atomic():
+            candidates = available
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            picked = list(candidates.values_list('pk', 'blood_group')[:units])
+            if len(picked) < units:
+                return []
+            issued = BloodUnit.objects.filter(pk__in=[pk for pk, _ in picked], status='AVAILABLE').update(
+                status='ISSUED', issued_to=blood_request, issued_at=timezone.now(),
+            )
+            if issued == len(picked):
+                taken = Counter(blood_group for _, blood_group in picked)
+                adjust_inventory({blood_group: -n for blood_group, n in taken.items()})
+                return [pk for pk, _ in picked]
+            # Without row locks (SQLite) another issue can win some rows; undo and pick again.
+            transaction.set_rollback(True)
+    return []
+
+
+def expire_units(today=None):
+    """Mark AVAILABLE units past their expiry date as EXPIRED; returns {blood_group: count}."""
+    today = today or timezone.localdate()
+    expired = {}
+    with transaction.atomic():
+        for blood_group, _ in BLOOD_GROUP_CHOICES:
+            # Each UPDATE reports exactly the rows it changed, even with concurrent issues.
+            expired[blood_group] = BloodUnit.objects.filter(
+                status='AVAILABLE', blood_group=blood_group, expires_on__lt=today,
+            ).update(status='EXPIRED')
+        adjust_inventory({blood_group: -n for blood_group, n in expired.items()})
+    return {blood_group: n for blood_group, n in expired.items() if n}
+
+
+def recount_inventory():
+    """Reset the BloodInventory projection from the AVAILABLE units; returns {blood_group: (old, new)}."""
+    counts = dict(
+        BloodUnit.objects.filter(status='AVAILABLE').values('blood_group').annotate(n=Count('pk'))
+        .values_list('blood_group', 'n')
+    )
+    changed = {}
+    with transaction.atomic():
+        for inventory in get_or_create_inventory().select_for_update():
+            actual = counts.get(inventory.blood_group, 0)
+            if inventory.units_available != actual:
+                changed[inventory.blood_group] = (inventory.units_available, actual)
+                inventory.units_available = actual
+                inventory.save()
+    return changed
+
+
+def inventory_version():
+    """Current inventory version, from the cache when possible."""
+    version = cache.get(INVENTORY_VERSION_KEY)
+    if version is None:
+        version = ChangeCounter.objects.filter(name=INVENTORY_COUNTER).values_list('value', flat=True).first() or 0
+        cache.set(INVENTORY_VERSION_KEY, version, INVENTORY_VERSION_TIMEOUT)
+    return version
+
+
+def invalidate_inventory_version():
+    transaction.on_commit(lambda: cache.delete(INVENTORY_VERSION_KEY))
+
+
+def bulk_update_rows(model, objs, fields):
+    """Write `fields` of already-saved objs with one parameterized UPDATE via executemany.
+
+    bulk_update() compiles a CASE expression per row and column, which costs far
+    more than the write itself on large batches. Like bulk_update(), this skips
+    save() and signals.
+    """
+    if not objs:
+        return
+    qn = connection.ops.quote_name
+    meta = model._meta
+    columns = [meta.get_field(name) for name in fields]
+    sql = "UPDATE {} SET {} WHERE {} = %s".format(
+        qn(meta.db_table),
+        ', '.join(f"{qn(field.column)} = %s" for field in columns),
+        qn(meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in columns] + [obj.pk]
+        for obj in objs
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def update_inventory_on_donation(donation, component='WHOLE_BLOOD'):
+    return receive_donation_units(donation, component)
+
+
+def update_inventory_on_issue(blood_group, units, blood_request=None):
+    return bool(allocate_units(blood_group, units, blood_request))
+
+
+# Columns needed to score a donor; prioritize_donors_for_request reads only these.
+SCORING_FIELDS = (
+    'id', 'blood_group', 'is_available', 'total_donations', 'responsiveness_score',
+    'reputation_points', 'city', 'last_donation_date', 'latitude', 'longitude',
+)
+
+# Donors this close to the request's coordinates score like a same-city match,
+# and within AREA_KM like a nearby one.
+NEAR_KM = 10
+AREA_KM = 40
+
+
+def _score_values(blood_group, is_available, total_donations, responsiveness_score,
+                  reputation_points, city, last_donation_date, latitude, longitude,
+                  request_bg, location, request_coords, today):
+    # `location` is expected lower-cased already; additions keep the original
+    # order so batched and per-instance scores compare equal as floats.
     score = 0.0
 
-    if donor.blood_group == request.blood_group:
+    if blood_group == request_bg:
         score += 50
 
-    if donor.is_eligible:
+    days = (today - last_donation_date).days if last_donation_date else None
+    if days is None or days >= 90:
         score += 20
     else:
         score -= 20
 
-    if donor.is_available:
+    if is_available:
         score += 10
     else:
         score -= 30
 
-    score += min(donor.total_donations * 2, 20)
-    score += min(donor.responsiveness_score, 20)
-    score += min(donor.reputation_points / 10, 20)
+    score += min(total_donations * 2, 20)
+    score += min(responsiveness_score, 20)
+    score += min(reputation_points / 10, 20)
 
-    if donor.city and request.location:
-        if donor.city.lower() == request.location.lower():
+    if request_coords and latitude is not None and longitude is not None:
+        distance = haversine_km(request_coords[0], request_coords[1], latitude, longitude)
+        if distance <= NEAR_KM:
+            score += 15
+        elif distance <= AREA_KM:
+            score += 5
+    elif city and location:
+        # Without coordinates on both sides, fall back to comparing names.
+        city = city.lower()
+        words = city.split()
+        if city == location:
             score += 15
-        elif donor.city.split()[0].lower() in request.location.lower():
+        elif words and words[0] in location:
             score += 5
 
-    if donor.last_donation_date:
-        days = (timezone.now().date() - donor.last_donation_date).days
-        if days < 90:
-            score -= 40
+    if days is not None and days < 90:
+        score -= 40
 
     return score
 
 
+def calculate_donor_score(donor: Donor, request: BloodRequest) -> float:
+    return _score_values(
+        donor.blood_group, donor.is_available, donor.total_donations,
+        donor.responsiveness_score, donor.reputation_points, donor.city,
+        donor.last_donation_date, donor.latitude, donor.longitude,
+        request.blood_group, (request.location or '').lower(), _coords(request),
+        timezone.now().date(),
+    )
+
+
+def _coords(obj):
+    if obj.latitude is None or obj.longitude is None:
+        return None
+    return obj.latitude, obj.longitude
+
+
+def score_donor_rows(rows, request: BloodRequest, today=None):
+    """Yield (donor_id, is_exact_match, score) for rows shaped like SCORING_FIELDS."""
+    today = today or timezone.now().date()
+    request_bg = request.blood_group
+    location = (request.location or '').lower()
+    request_coords = _coords(request)
+    for pk, *values in rows:
+        yield pk, values[0] == request_bg, _score_values(*values, request_bg, location, request_coords, today)
+
+
+def donor_candidates(request: BloodRequest, fields=SCORING_FIELDS):
+    # One IN query over every group the patient can safely receive; donors
+    # still inside their donation interval are filtered out by the index.
+    return Donor.objects.filter(
+        eligible_on(timezone.now().date()),
+        blood_group__in=compatible_donor_groups(request.blood_group),
+        is_available=True,
+    ).values_list(*fields)
+
+
 def prioritize_donors_for_request(request: BloodRequest, limit=20):
-    donors = Donor.objects.filter(blood_group=request.blood_group, is_available=True)
-    scored = [(d, calculate_donor_score(d, request)) for d in donors]
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return [d for d, s in scored[:limit] if s > 0]
+    rows = donor_candidates(request).iterator(chunk_size=2000)
+    # Exact group matches rank above merely compatible donors; nlargest is
+    # stable, so ties keep queryset order exactly like sort(reverse=True).
+    top = heapq.nlargest(limit, score_donor_rows(rows, request), key=itemgetter(1, 2))
+    ids = [pk for pk, _, s in top if s > 0]
+    donors = Donor.objects.in_bulk(ids)
+    return [donors[pk] for pk in ids]
 
 
 COMPATIBILITY = {
@@ -75,10 +322,30 @@ COMPATIBILITY = {
     'AB+': ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'],
 }
 
+# Precomputed from COMPATIBILITY: one bit per blood group, and for each patient
+# group the mask of donor groups it may receive.
+BLOOD_GROUP_BITS = {bg: 1 << i for i, (bg, _) in enumerate(BLOOD_GROUP_CHOICES)}
+COMPATIBLE_DONOR_MASKS = {
+    patient_bg: sum(BLOOD_GROUP_BITS[bg] for bg in donor_bgs)
+    for patient_bg, donor_bgs in COMPATIBILITY.items()
+}
+_COMPATIBLE_DONOR_GROUPS = {
+    patient_bg: tuple(bg for bg, _ in BLOOD_GROUP_CHOICES if mask & BLOOD_GROUP_BITS[bg])
+    for patient_bg, mask in COMPATIBLE_DONOR_MASKS.items()
+}
 
-def crossmatch_assistant(patient_bg: str, donor_bg: str):
-    safe_donors = COMPATIBILITY.get(patient_bg, [])
-    is_compatible = donor_bg in safe_donors
+
+def is_compatible_group(patient_bg, donor_bg):
+    return bool(COMPATIBLE_DONOR_MASKS.get(patient_bg, 0) & BLOOD_GROUP_BITS.get(donor_bg, 0))
+
+
+def compatible_donor_groups(patient_bg):
+    # Unknown groups fall back to an exact match only.
+    return _COMPATIBLE_DONOR_GROUPS.get(patient_bg, (patient_bg,))
+
+
+def _crossmatch(patient_bg, donor_bg):
+    is_compatible = is_compatible_group(patient_bg, donor_bg)
 
     explanation = ""
     if is_compatible:
@@ -93,7 +360,7 @@ def crossmatch_assistant(patient_bg: str, donor_bg: str):
         )
 
     complexity_flag = False
-    if patient_bg.startswith('AB') and donor_bg not in safe_donors:
+    if patient_bg.startswith('AB') and not is_compatible:
         complexity_flag = True
 
     return {
@@ -101,3 +368,30 @@ def crossmatch_assistant(patient_bg: str, donor_bg: str):
         'complexity_flag': complexity_flag,
         'explanation': explanation,
     }
+
+
+# The rules are static, so every answer for the 8x8 known groups is built
+# once at import: as a dict, and as the JSON fragment the batch API emits.
+CROSSMATCH_MATRIX = {
+    (patient_bg, donor_bg): _crossmatch(patient_bg, donor_bg)
+    for patient_bg, _ in BLOOD_GROUP_CHOICES
+    for donor_bg, _ in BLOOD_GROUP_CHOICES
+}
+_CROSSMATCH_JSON = {
+    pair: json.dumps({'patient_bg': pair[0], 'donor_bg': pair[1], **result})
+    for pair, result in CROSSMATCH_MATRIX.items()
+}
+
+
+def crossmatch_assistant(patient_bg: str, donor_bg: str):
+    result = CROSSMATCH_MATRIX.get((patient_bg, donor_bg))
+    # Copy so callers can't alter the shared table.
+    return dict(result) if result is not None else _crossmatch(patient_bg, donor_bg)
+
+
+def crossmatch_json(patient_bg, donor_bg):
+    """Encoded JSON object for one pair, including the groups themselves."""
+    encoded = _CROSSMATCH_JSON.get((patient_bg, donor_bg))
+    if encoded is None:
+        encoded = json.dumps({'patient_bg': patient_bg, 'donor_bg': donor_bg, **_crossmatch(patient_bg, donor_bg)})
+    return encoded
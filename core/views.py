@@ -1,47 +1,102 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.db.models import Sum
-from .models import Donor, BloodInventory, BloodRequest, Donation
-from .forms import DonorForm, BloodRequestForm, DonationForm, PatientQRFilterForm
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods, require_POST
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from .models import Donor, BloodInventory, BloodRequest, eligible_on, next_eligible_date
+from .forms import (
+    DonorForm,
+    BloodRequestForm,
+    DonationForm,
+    PatientQRFilterForm,
+    DonorListFilterForm,
+    RequestListFilterForm,
+    ReportFilterForm,
+    ExportFilterForm,
+    DonorSearchForm,
+    IssueUnitsForm,
+)
+from .pagination import keyset_order, keyset_paginate, stream_table
+from .dashboard import get_dashboard_snapshot
+from .rollups import daily_report
+from .metrics import prometheus_text
+from .ranking import ranked_donors
+from .search import DEFAULT_LIMIT, filter_donors, search_donors
+from .db import read_replica
+from .exports import EXPORTS, RENDERERS, gzipped
+from .allocation import apply_plan, available_stock, open_requests, plan_allocation, summarize
+from .geo import lookup_place, nearest
 from django.contrib.auth import logout
 from django.shortcuts import redirect
 from .utils import (
     get_or_create_inventory,
     update_inventory_on_donation,
     update_inventory_on_issue,
-    prioritize_donors_for_request,
     crossmatch_assistant,
+    crossmatch_json,
+    inventory_version,
+)
+from .notifications import (
+    email_outbox_message,
+    sms_outbox_message,
+    queue_notifications,
+    queue_email_notification,
 )
-from .notifications import send_email_notification, send_sms_notification
 
 
 @login_required
+@read_replica
 def dashboard(request):
-    donor_count = Donor.objects.count()
-    total_units = BloodInventory.objects.aggregate(total=Sum('units_available'))['total'] or 0
-    pending_requests = BloodRequest.objects.filter(status='PENDING').count()
-    fulfilled_requests = BloodRequest.objects.filter(status='FULFILLED').count()
-
-    inventory = get_or_create_inventory()
-    donations_stats = Donation.objects.values('blood_group').annotate(total_units=Sum('units'))
-
-    context = {
-        'donor_count': donor_count,
-        'total_units': total_units,
-        'pending_requests': pending_requests,
-        'fulfilled_requests': fulfilled_requests,
-        'inventory': inventory,
-        'donations_stats': donations_stats,
-    }
+    context = {**get_dashboard_snapshot(), 'event_stream_url': settings.EVENT_STREAM_URL}
     return render(request, 'core/dashboard.html', context)
 
 
 @login_required
+@read_replica
 def donor_list(request):
-    donors = Donor.objects.all().order_by('-created_at')
-    return render(request, 'core/donor_list.html', {'donors': donors})
+    form = DonorListFilterForm(request.GET or None)
+    donors = Donor.objects.all()
+    descending = True
+    if form.is_valid():
+        blood_group = form.cleaned_data.get('blood_group')
+        city = form.cleaned_data.get('city')
+        is_available = form.cleaned_data.get('is_available')
+        eligibility = form.cleaned_data.get('eligibility')
+        term = form.cleaned_data.get('q', '').strip()
+
+        if term:
+            donors = filter_donors(donors, term)
+        if blood_group:
+            donors = donors.filter(blood_group=blood_group)
+        if city:
+            donors = donors.filter(city__iexact=city.strip())
+        if is_available:
+            donors = donors.filter(is_available=is_available == 'yes')
+        if eligibility == 'eligible':
+            donors = donors.filter(eligible_on(timezone.now().date()))
+        elif eligibility == 'waiting':
+            donors = donors.exclude(eligible_on(timezone.now().date()))
+        descending = form.cleaned_data.get('sort') != 'oldest'
+
+    if request.GET.get('stream'):
+        return stream_table(
+            request, 'core/donor_list.html', {'form': form},
+            'core/donor_rows.html', 'donors', keyset_order(donors, descending),
+        )
+
+    page = keyset_paginate(donors, request.GET, descending=descending)
+    return render(request, 'core/donor_list.html', {'form': form, 'donors': page.object_list, 'page': page})
 
 # core/views.py
 from django.contrib.auth import authenticate, login
@@ -118,10 +173,29 @@ def donor_delete(request, pk):
     return render(request, 'core/confirm_delete.html', {'object': donor, 'type': 'Donor'})
 
 
+@login_required
+@read_replica
+def reports(request):
+    form = ReportFilterForm(request.GET or None)
+    days = (form.cleaned_data.get('days') if form.is_valid() else None) or 30
+    until = timezone.localdate()
+    report = daily_report(until - timedelta(days=days - 1), until)
+    # Bar widths for the daily table, relative to the busiest day.
+    peak_units = max([row['units'] for row in report['days']] + [1])
+    peak_requests = max([row['requests'] for row in report['days']] + [1])
+    for row in report['days']:
+        row['units_pct'] = 100 * row['units'] / peak_units
+        row['requests_pct'] = 100 * row['requests'] / peak_requests
+    return render(request, 'core/reports.html', {**report, 'form': form, 'period_days': days})
+
+
 @login_required
 def inventory_view(request):
     inventory = get_or_create_inventory()
-    return render(request, 'core/inventory.html', {'inventory': inventory})
+    return render(request, 'core/inventory.html', {
+        'inventory': inventory,
+        'event_stream_url': settings.EVENT_STREAM_URL,
+    })
 
 
 @login_required
@@ -129,14 +203,17 @@ def donation_create(request):
     if request.method == 'POST':
         form = DonationForm(request.POST)
         if form.is_valid():
-            donation = form.save()
-            donor = donation.donor
-            donor.total_donations += 1
-            donor.last_donation_date = donation.donation_date
-            donor.reputation_points += 10
-            donor.save()
-
-            update_inventory_on_donation(donation)
+            with transaction.atomic():
+                donation = form.save()
+                # Counters are bumped in SQL so concurrent donations don't overwrite each other.
+                Donor.objects.filter(pk=donation.donor_id).update(
+                    total_donations=F('total_donations') + 1,
+                    reputation_points=F('reputation_points') + 10,
+                    last_donation_date=donation.donation_date,
+                    next_eligible_date=next_eligible_date(donation.donation_date),
+                    updated_at=timezone.now(),
+                )
+                update_inventory_on_donation(donation, form.cleaned_data['component'])
 
             messages.success(request, 'Donation recorded and inventory updated.')
             return redirect('core:inventory')
@@ -146,21 +223,39 @@ def donation_create(request):
 
 
 @login_required
+@read_replica
 def request_list(request):
-    requests = BloodRequest.objects.all().order_by('-created_at')
-    return render(request, 'core/request_list.html', {'requests': requests})
+    form = RequestListFilterForm(request.GET or None)
+    requests = BloodRequest.objects.all()
+    descending = True
+    if form.is_valid():
+        for field in ('status', 'blood_group', 'urgency'):
+            value = form.cleaned_data.get(field)
+            if value:
+                requests = requests.filter(**{field: value})
+        descending = form.cleaned_data.get('sort') != 'oldest'
+
+    if request.GET.get('stream'):
+        return stream_table(
+            request, 'core/request_list.html', {'form': form},
+            'core/request_rows.html', 'requests', keyset_order(requests, descending),
+        )
+
+    page = keyset_paginate(requests, request.GET, descending=descending)
+    return render(request, 'core/request_list.html', {'form': form, 'requests': page.object_list, 'page': page})
 
 
 def request_create(request):
     if request.method == 'POST':
         form = BloodRequestForm(request.POST)
         if form.is_valid():
-            blood_request = form.save()
-            send_email_notification(
-                to_email=getattr(request.user, 'email', None),
-                subject=f"New Blood Request #{blood_request.id}",
-                message=f"A new blood request has been created for {blood_request.blood_group} ({blood_request.units_requested} units).",
-            )
+            with transaction.atomic():
+                blood_request = form.save()
+                queue_email_notification(
+                    to_email=getattr(request.user, 'email', None),
+                    subject=f"New Blood Request #{blood_request.id}",
+                    message=f"A new blood request has been created for {blood_request.blood_group} ({blood_request.units_requested} units).",
+                )
             messages.success(request, 'Blood request created.')
             #return redirect('core:request_list')
     else:
@@ -171,8 +266,9 @@ def request_create(request):
 @login_required
 def request_detail(request, pk):
     blood_request = get_object_or_404(BloodRequest, pk=pk)
-    recommended_donors = prioritize_donors_for_request(blood_request)
+    recommended_donors = ranked_donors(blood_request)
     inventory = BloodInventory.objects.filter(blood_group=blood_request.blood_group).first()
+    issued_units = blood_request.blood_units.order_by('issued_at', 'id')
     return render(
         request,
         'core/request_detail.html',
@@ -180,6 +276,7 @@ def request_detail(request, pk):
             'request_obj': blood_request,
             'recommended_donors': recommended_donors,
             'inventory': inventory,
+            'issued_units': issued_units,
         },
     )
 
@@ -187,29 +284,32 @@ def request_detail(request, pk):
 @login_required
 def assign_donors_to_request(request, pk):
     blood_request = get_object_or_404(BloodRequest, pk=pk)
-    recommended_donors = prioritize_donors_for_request(blood_request)
 
     if request.method == 'POST':
         donor_ids = request.POST.getlist('donors')
-        units_to_issue = int(request.POST.get('units_to_issue', blood_request.units_requested))
-
-        if not update_inventory_on_issue(blood_request.blood_group, units_to_issue):
-            messages.error(request, 'Not enough stock in inventory.')
+        form = IssueUnitsForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, 'Units to issue must be a whole number, at least 1.')
             return redirect('core:request_detail', pk=blood_request.id)
-
-        donors = Donor.objects.filter(id__in=donor_ids)
-        blood_request.donors_assigned.set(donors)
-        blood_request.status = 'FULFILLED'
-        blood_request.save()
-
-        for d in donors:
-            sms_message = f"You are requested to donate blood ({d.blood_group}) for patient {blood_request.patient_name} at {blood_request.location}."
-            send_sms_notification(d.phone, sms_message)
-            send_email_notification(
-                d.email,
-                "Urgent Blood Donation Request",
-                sms_message,
-            )
+        units_to_issue = form.cleaned_data['units_to_issue'] or blood_request.units_requested
+
+        with transaction.atomic():
+            if not update_inventory_on_issue(blood_request.blood_group, units_to_issue, blood_request):
+                messages.error(request, 'Not enough stock in inventory.')
+                return redirect('core:request_detail', pk=blood_request.id)
+
+            donors = Donor.objects.filter(id__in=donor_ids)
+            blood_request.donors_assigned.set(donors)
+            blood_request.status = 'FULFILLED'
+            blood_request.save()
+
+            # Queued in the same transaction; process_outbox delivers them.
+            outbox = []
+            for d in donors:
+                sms_message = f"You are requested to donate blood ({d.blood_group}) for patient {blood_request.patient_name} at {blood_request.location}."
+                outbox.append(sms_outbox_message(d.phone, sms_message))
+                outbox.append(email_outbox_message(d.email, "Urgent Blood Donation Request", sms_message))
+            queue_notifications(outbox)
 
         messages.success(request, 'Donors assigned and notified, inventory updated.')
         return redirect('core:request_detail', pk=blood_request.id)
@@ -219,14 +319,18 @@ def assign_donors_to_request(request, pk):
         'core/assign_donors.html',
         {
             'request_obj': blood_request,
-            'recommended_donors': recommended_donors,
+            'recommended_donors': ranked_donors(blood_request),
         },
     )
 
 
+SEARCH_RADIUS_KM = 25
+
+
+@read_replica
 def patient_qr_view(request):
     form = PatientQRFilterForm(request.GET or None)
-    donors = Donor.objects.filter(is_available=True)
+    donors = Donor.objects.filter(eligible_on(timezone.now().date()), is_available=True)
     if form.is_valid():
         blood_group = form.cleaned_data.get('blood_group')
         city = form.cleaned_data.get('city')
@@ -235,7 +339,15 @@ def patient_qr_view(request):
         if blood_group:
             donors = donors.filter(blood_group=blood_group)
         if city:
-            donors = donors.filter(city__icontains=city)
+            coords = lookup_place(city)
+            if coords:
+                # Indexed grid-cell lookup, nearest donors first.
+                radius_km = form.cleaned_data.get('radius_km') or SEARCH_RADIUS_KM
+                located = nearest(donors, coords[0], coords[1], radius_km)
+                # Rows not yet given coordinates (see backfill_locations) still match by city.
+                donors = located + list(donors.filter(grid_cell='', city__istartswith=city.strip()))
+            else:
+                donors = donors.filter(city__istartswith=city.strip())
 
     return render(request, 'core/patient_qr.html', {'form': form, 'donors': donors})
 
@@ -254,6 +366,17 @@ def donor_qr_view(request):
     return render(request, 'core/donor_qr.html', {'steps': steps, 'centers': centers})
 
 
+# Compatibility rules never change at runtime, so clients and proxies may keep answers for a day.
+CROSSMATCH_CACHE_SECONDS = 60 * 60 * 24
+CROSSMATCH_BATCH_LIMIT = 10000
+
+
+def _cacheable(response):
+    # Only answers are cached; a 400 must not stick to a client that fixes its request.
+    patch_cache_control(response, public=True, max_age=CROSSMATCH_CACHE_SECONDS)
+    return response
+
+
 def crossmatch_api(request):
     patient_bg = request.GET.get('patient_bg')
     donor_bg = request.GET.get('donor_bg')
@@ -261,6 +384,157 @@ def crossmatch_api(request):
         return JsonResponse({'error': 'patient_bg and donor_bg are required'}, status=400)
 
     result = crossmatch_assistant(patient_bg, donor_bg)
-    return JsonResponse(result)
+    return _cacheable(JsonResponse(result))
+
+
+@csrf_exempt
+@require_POST
+def crossmatch_batch_api(request):
+    """Crossmatch many pairs in one call.
+
+    Accepts either {"pairs": [{"patient_bg": ..., "donor_bg": ...}, ...]}
+    or {"patient_bg": ..., "donor_bgs": [...]} for one patient against many bags.
+    """
+    try:
+        payload = json.loads(request.body)
+        if 'pairs' in payload:
+            pairs = [(p['patient_bg'], p['donor_bg']) for p in payload['pairs']]
+        else:
+            pairs = [(payload['patient_bg'], donor_bg) for donor_bg in payload['donor_bgs']]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse(
+            {'error': 'expected {"pairs": [{"patient_bg", "donor_bg"}]} or {"patient_bg", "donor_bgs"}'},
+            status=400,
+        )
+    if not all(isinstance(bg, str) and bg for pair in pairs for bg in pair):
+        return JsonResponse({'error': 'blood groups must be non-empty strings'}, status=400)
+    if len(pairs) > CROSSMATCH_BATCH_LIMIT:
+        return JsonResponse({'error': f'at most {CROSSMATCH_BATCH_LIMIT} pairs per call'}, status=400)
+
+    # Join the precomputed fragments instead of re-encoding each result.
+    body = '{"results": [' + ', '.join(crossmatch_json(p, d) for p, d in pairs) + ']}'
+    return _cacheable(HttpResponse(body, content_type='application/json'))
+
+
+def _inventory_since(request):
+    try:
+        return max(int(request.GET.get('since', 0)), 0)
+    except ValueError:
+        return 0
+
+
+def inventory_etag(request):
+    # Served from the cache, so a matching If-None-Match never reaches the database.
+    return f"inventory-{inventory_version()}-{_inventory_since(request)}"
+
+
+@login_required
+@cache_control(no_cache=True)
+@condition(etag_func=inventory_etag)
+def inventory_api(request):
+    """Current stock per blood group.
+
+    Clients poll with If-None-Match and get 304 until stock changes, or pass
+    ?since=<version> to receive only the groups changed after that version.
+    """
+    since = _inventory_since(request)
+    rows = BloodInventory.objects.order_by('blood_group')
+    if since:
+        rows = rows.filter(version__gt=since)
+    inventory = list(rows.values('blood_group', 'units_available', 'version'))
+    version = max([inventory_version()] + [row['version'] for row in inventory])
+    return JsonResponse({'version': version, 'since': since, 'inventory': inventory})
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def allocation_api(request):
+    """GET previews how stock would be split over the open requests; POST issues it."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Staff only")
+    plan, leftover = plan_allocation(open_requests(), available_stock())
+    payload = {
+        'summary': summarize(plan),
+        'leftover': leftover,
+        'allocations': [
+            {'request': r.pk, 'blood_group': r.blood_group, 'urgency': r.urgency, 'needed': r.needed, 'units': groups}
+            for r, groups in plan
+        ],
+    }
+    if request.method == 'POST':
+        payload['applied'] = apply_plan(plan)
+    return JsonResponse(payload)
+
+
+@login_required
+@read_replica
+def donor_search_api(request):
+    """Donors by phone-number or name-word prefix, best match first (?q, ?blood_group, ?limit)."""
+    form = DonorSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    donors = search_donors(
+        form.cleaned_data['q'],
+        limit=form.cleaned_data['limit'] or DEFAULT_LIMIT,
+        blood_group=form.cleaned_data['blood_group'] or None,
+    )
+    return JsonResponse({'results': [
+        {
+            'id': donor.pk,
+            'name': donor.name,
+            'phone': donor.phone,
+            'blood_group': donor.blood_group,
+            'city': donor.city,
+            'is_available': donor.is_available,
+            'is_eligible': donor.is_eligible,
+            'url': reverse('core:donor_update', args=[donor.pk]),
+        }
+        for donor in donors
+    ]})
+
+
+@login_required
+@read_replica
+def export(request, dataset):
+    """Stream a filtered extract as CSV or JSON lines (?since, ?until, ?blood_group, ?format, ?gzip)."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Staff only")
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise Http404("Unknown export")
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    filters = form.cleaned_data
+    if filters['blood_group'] and spec.blood_group_field is None:
+        return JsonResponse({'errors': {'blood_group': [f"{dataset} have no blood group."]}}, status=400)
+
+    fmt = filters['format'] or 'csv'
+    rows = spec.queryset(filters['since'], filters['until'], filters['blood_group'])
+    content = RENDERERS[fmt](spec.headers, spec.chunks(rows))
+    filename = '-'.join(str(part) for part in (dataset, filters['since'], filters['until']) if part) + f'.{fmt}'
+    if filters['gzip']:
+        content = gzipped(content)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    else:
+        content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Ask nginx-style proxies to pass chunks through rather than buffer the whole export.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_active and request.user.is_staff
+    if token and not authorized:
+        authorized = constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+    if not authorized:
+        return HttpResponseForbidden("Staff only")
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def donate(request):
     return render(request,'core/donate.html')